@@ -2,6 +2,7 @@
 # 只改进标准化部分，保持其他代码不变
 
 import os
+import sys
 import cv2
 import numpy as np
 import torch
@@ -252,6 +253,69 @@ class PLStarSegmentationDataset(Dataset):
         return normalized_image, mask
 
 
+class RadonFeatureTransform:
+    """
+    🔥 Radon 特征通道：作为 PLStarSegmentationDataset 的 transform 使用，
+    给每个样本追加一个粗分辨率正弦图通道（降采样 + 粗角度），
+    输出图像由 (1, H, W) 变为 (2, H, W)，模型的输入通道数需相应改为 2。
+
+    - 正弦图经 UI/radon.py 的 SinogramCache 缓存：按图像内容哈希，
+      每个文件只计算一次（而不是每个 epoch 一次）
+    - 指定 cache_dir 后结果写到磁盘，DataLoader 的多个 worker 与多次运行共享
+    - base_transform（数据增强）在 Radon 之前执行；随机增强会改变图像内容，
+      此时缓存无法命中，代价又回到每个 epoch 一次
+    """
+
+    def __init__(self, angle_step_deg=4.0, downsample=4, cache_dir=None,
+                 max_cache_bytes=256 << 20, method="ray", base_transform=None):
+        # UI 目录只插入一次，且放在最前面，避免 PyPI 上同名的 radon 包抢先被导入
+        ui_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                               os.pardir, "UI"))
+        if ui_dir not in sys.path:
+            sys.path.insert(0, ui_dir)
+        from radon import SinogramCache, downsample_mean
+
+        self._downsample_mean = downsample_mean
+        self.angles_deg = np.arange(0.0, 180.0, angle_step_deg)
+        self.downsample = downsample
+        self.method = method
+        self.base_transform = base_transform
+        self.cache = SinogramCache(max_bytes=max_cache_bytes, cache_dir=cache_dir)
+
+    def sinogram_channel(self, image_2d):
+        """
+        (H, W) 图像 → (H, W) 的正弦图通道（s 沿行、θ 沿列，缩放到图像尺寸，
+        按最大值归一化到 [0, 1]）
+        """
+        h, w = image_2d.shape
+        small = self._downsample_mean(np.ascontiguousarray(image_2d, dtype=np.float32),
+                                      self.downsample)
+        sino, _, _ = self.cache.radon(small, self.angles_deg, method=self.method,
+                                      dtype=np.float32)
+        channel = cv2.resize(np.asarray(sino, dtype=np.float32), (w, h),
+                             interpolation=cv2.INTER_LINEAR)
+        peak = float(np.abs(channel).max())
+        return channel / peak if peak > 0 else channel
+
+    def __call__(self, image, mask):
+        if self.base_transform is not None:
+            transformed = self.base_transform(image=image, mask=mask)
+            image, mask = transformed['image'], transformed['mask']
+
+        is_tensor = torch.is_tensor(image)
+        array = image.detach().cpu().numpy() if is_tensor else np.asarray(image)
+        plane = array[0] if array.ndim == 3 else array
+        channel = self.sinogram_channel(plane)
+
+        if is_tensor:
+            extra = torch.from_numpy(channel).to(image.dtype).unsqueeze(0)
+            image = torch.cat([image if image.dim() == 3 else image.unsqueeze(0), extra], dim=0)
+        else:
+            image = np.concatenate([array if array.ndim == 3 else array[None],
+                                    channel[None].astype(array.dtype)], axis=0)
+        return {'image': image, 'mask': mask}
+
+
 # 🔥 使用示例
 def create_pl_star_dataset():
     """
@@ -265,6 +329,7 @@ def create_pl_star_dataset():
         use_global_stats=True,          # 🔥 关键：启用全局标准化
         preserve_precision=True,        # 🔥 关键：保持数值精度
         transform=None                  # 先不加数据增强
+        # transform=RadonFeatureTransform(cache_dir="radon_cache")  # 🔥 追加正弦图通道
     )
     
     print(f"\n🎯 PL Star数据集创建完成:")
@@ -7,6 +7,7 @@
 #    - 列（横轴 x）：角度 θ（度）
 # ✅ 可选可视化仅用 matplotlib（不是必须），便于快速验证
 # ✅ 主要思路：Rotate-and-Sum（旋转 + 列求和）近似线积分
+# ✅ 可选 RadonProjector：预计算稀疏系统矩阵（需要 SciPy）
 # -----------------------------------------------------------
 # 术语说明 / Terms:
 # - s (detector position): 探测器坐标（以像素为单位，中心对齐）
@@ -14,7 +15,16 @@
 # - Sinogram: 正弦图，记录不同角度 θ 下关于 s 的投影值
 # -----------------------------------------------------------
 
+import contextlib
+import functools
+import hashlib
+import json
 import math
+import os
+import threading
+import time
+import tracemalloc
+import zipfile
 import numpy as np
 
 
@@ -57,23 +67,70 @@ def pad_to_diagonal(img: np.ndarray, fill: float = 0.0) -> np.ndarray:
 # 2) 仅保留内切圆视野（经典 Radon 定义）
 #    Keep only the inscribed circular field-of-view (classical Radon)
 # ===========================================================
-def apply_circular_fov(img: np.ndarray) -> np.ndarray:
+@functools.lru_cache(maxsize=8)
+def fov_mask(h: int, w: int, margin: float = 0.0) -> np.ndarray:
+    """
+    内切圆（半径外扩 margin）的布尔掩膜，按形状缓存、只读。
+    行、列坐标分别广播，不分配完整 meshgrid。
+    Read-only boolean mask of the inscribed disk (radius grown by
+    `margin`), cached per shape and built by broadcasting a row and a
+    column instead of full meshgrids.
+    """
+    cy, cx = (h - 1) / 2.0, (w - 1) / 2.0
+    r = min(cx, cy) + margin
+    # dx² ≤ r² − dy²：只分配布尔结果 / only the boolean result is allocated
+    mask = ((np.arange(w) - cx) ** 2)[None, :] <= (r ** 2 - (np.arange(h) - cy) ** 2)[:, None]
+    mask.flags.writeable = False
+    return mask
+
+
+@functools.lru_cache(maxsize=8)
+def fov_row_spans(h: int, w: int):
+    """
+    每行在内切圆内的列区间 [x0, x1)（空行 x0 == x1），按形状缓存。
+    Per-row column span [x0, x1) inside the inscribed disk (x0 == x1 for
+    empty rows), cached per shape.
+    """
+    mask = fov_mask(h, w)
+    counts = mask.sum(axis=1)
+    x0 = np.where(counts > 0, mask.argmax(axis=1), 0)
+    x1 = x0 + counts
+    x0.flags.writeable = False
+    x1.flags.writeable = False
+    return x0, x1
+
+
+def apply_circular_fov(img: np.ndarray, out=None) -> np.ndarray:
     """
     将内切圆之外的区域置零，使视野符合经典 Radon 变换的定义。
     Zero out pixels outside the inscribed circle.
 
+    Parameters
+    ----------
+    out : np.ndarray or None
+        输出数组；传入 img 本身即原地处理（只清零圆外的行段，无整图临时数组）。
+        Output array; pass `img` itself to mask in place (only the spans
+        outside the disk are cleared, no full-image temporaries).
+
     Notes:
     - 这有助于减少边缘伪影；对于非圆形 FOV 可按需关闭。
       Helpful to reduce edge artifacts; disable if undesired.
+    - 掩膜与行区间按形状缓存（fov_mask / fov_row_spans）。
+      The mask and row spans are cached per shape.
     """
     h, w = img.shape
-    cy, cx = (h - 1) / 2.0, (w - 1) / 2.0
-    yy, xx = np.meshgrid(np.arange(h), np.arange(w), indexing="ij")
-    r = min(cx, cy)
-    mask = (xx - cx) ** 2 + (yy - cy) ** 2 <= r ** 2
+    if out is img:
+        x0, x1 = fov_row_spans(h, w)
+        for y in range(h):
+            img[y, :x0[y]] = 0
+            img[y, x1[y]:] = 0
+        return img
 
-    out = np.zeros_like(img)
-    out[mask] = img[mask]
+    if out is None:
+        out = np.zeros_like(img)
+    else:
+        out[...] = 0
+    np.copyto(out, img, where=fov_mask(h, w))
     return out
 
 
@@ -81,7 +138,69 @@ def apply_circular_fov(img: np.ndarray) -> np.ndarray:
 # 3) 双线性插值采样器（向量化）
 #    Vectorized bilinear sampler
 # ===========================================================
-def sample_bilinear(img: np.ndarray, xs: np.ndarray, ys: np.ndarray, fill: float = 0.0) -> np.ndarray:
+def bilinear_taps(h: int, w: int, xs: np.ndarray, ys: np.ndarray, dtype=np.float64):
+    """
+    计算双线性插值的四个角点（展平索引）、权重以及越界掩码。
+    只依赖几何（尺寸与坐标），因此可在多张图像之间复用。
+    索引为 int32（H·W < 2³¹ 时，否则 intp），权重直接写入 dtype 数组（在 float64
+    中计算后舍入，与先算 float64 再转换逐位一致），不经 np.stack 复制。
+    Flattened corner indices, weights and out-of-bound mask for bilinear
+    sampling; depends only on geometry, so it can be reused across images.
+    Indices are int32 (intp once H·W ≥ 2³¹) and the weights are written
+    straight into a `dtype` array (computed in float64 and rounded, the
+    same as casting afterwards), with no np.stack copies.
+
+    Returns
+    -------
+    idx : np.ndarray (4, ...) int32 or intp
+        角点 a/b/c/d 的展平索引 / flat indices of corners a/b/c/d.
+    wts : np.ndarray (4, ...) dtype
+        对应的双线性权重 / matching bilinear weights.
+    outside : np.ndarray (...) bool
+        越界掩码 / out-of-bound mask.
+    """
+    shape = np.broadcast(xs, ys).shape
+    itype = np.int32 if h * w < 2 ** 31 else np.intp
+    idx = np.empty((4,) + shape, dtype=itype)
+    wts = np.empty((4,) + shape, dtype=dtype)
+
+    # 邻近整数栅格点与小数部分 / lower neighbors and fractional parts
+    x0 = np.floor(xs)
+    dx = xs - x0
+    x0 = x0.astype(itype)
+    y0 = np.floor(ys)
+    dy = ys - y0
+    y0 = y0.astype(itype)
+
+    # 限制索引到图像范围内（行号预乘 W）/ clip to image bounds (rows pre-scaled by W)
+    x1 = np.clip(x0 + 1, 0, w - 1)
+    np.clip(x0, 0, w - 1, out=x0)
+    y1 = np.clip(y0 + 1, 0, h - 1)
+    np.clip(y0, 0, h - 1, out=y0)
+    y0 *= w
+    y1 *= w
+    np.add(y0, x0, out=idx[0])
+    np.add(y0, x1, out=idx[1])
+    np.add(y1, x0, out=idx[2])
+    np.add(y1, x1, out=idx[3])
+    del x0, x1, y0, y1
+
+    # 双线性权重（dx 用完后原地变为 1 − dx，少一个临时数组）
+    # Bilinear weights; dx becomes 1 − dx in place once it is no longer needed
+    ey = 1 - dy
+    np.multiply(dx, ey, out=wts[1])
+    np.multiply(dx, dy, out=wts[3])
+    ex = np.subtract(1, dx, out=dx)
+    np.multiply(ex, ey, out=wts[0])
+    np.multiply(ex, dy, out=wts[2])
+    del ex, ey, dx, dy
+
+    outside = (xs < 0) | (xs > (w - 1)) | (ys < 0) | (ys > (h - 1))
+    return idx, wts, outside
+
+
+def sample_bilinear(img: np.ndarray, xs: np.ndarray, ys: np.ndarray, fill: float = 0.0,
+                    out: np.ndarray = None, scratch: np.ndarray = None) -> np.ndarray:
     """
     在浮点坐标 (xs, ys) 上对图像进行双线性插值。
     Bilinear sampling at floating-point coordinates.
@@ -94,6 +213,11 @@ def sample_bilinear(img: np.ndarray, xs: np.ndarray, ys: np.ndarray, fill: float
         Float coordinates in the source image space.
     fill : float
         越界时的填充值 / fill value for out-of-bound samples.
+    out, scratch : np.ndarray or None
+        可选的预分配输出与临时缓冲（与 xs 同形状），便于跨角度复用、
+        原地累加；浮点图像的计算精度与图像 dtype 一致（如 float32）。
+        Optional preallocated output and gather buffer (shape of xs), reused
+        across angles; floating images keep their dtype (e.g. float32).
 
     Returns
     -------
@@ -101,41 +225,36 @@ def sample_bilinear(img: np.ndarray, xs: np.ndarray, ys: np.ndarray, fill: float
         与 xs/ys 同形状的插值结果 / interpolated values.
     """
     h, w = img.shape
+    # 浮点图像的权重直接以图像 dtype 构建 / weights built in the image dtype
+    floating = np.issubdtype(img.dtype, np.floating)
+    idx, wts, outside = bilinear_taps(h, w, xs, ys,
+                                      dtype=img.dtype if floating else np.float64)
 
-    # 邻近四个整数栅格点 / the 4 neighbors
-    x0 = np.floor(xs).astype(np.int64)
-    y0 = np.floor(ys).astype(np.int64)
-    x1 = x0 + 1
-    y1 = y0 + 1
-
-    # 小数部分 / fractional parts
-    dx = xs - x0
-    dy = ys - y0
-
-    # 限制索引到图像范围内 / clip to image bounds
-    x0c = np.clip(x0, 0, w - 1)
-    x1c = np.clip(x1, 0, w - 1)
-    y0c = np.clip(y0, 0, h - 1)
-    y1c = np.clip(y1, 0, h - 1)
-
-    # 四个角点像素值 / fetch 4 corners
-    Ia = img[y0c, x0c]
-    Ib = img[y0c, x1c]
-    Ic = img[y1c, x0c]
-    Id = img[y1c, x1c]
-
-    # 双线性权重 / bilinear weights
-    wa = (1 - dx) * (1 - dy)
-    wb = dx * (1 - dy)
-    wc = (1 - dx) * dy
-    wd = dx * dy
-
-    out = Ia * wa + Ib * wb + Ic * wc + Id * wd
+    # 四个角点像素值 × 双线性权重 / 4 corners × bilinear weights
+    flat = img.ravel()
+    if out is None and not floating:
+        out = (flat[idx[0]] * wts[0] + flat[idx[1]] * wts[1]
+               + flat[idx[2]] * wts[2] + flat[idx[3]] * wts[3])
+    else:
+        # 原地：out = Ia·wa，再依次累加其余三项（求值顺序与上式相同），
+        # gather 直接写入缓冲，不产生整幅临时数组
+        # In place, same evaluation order as the expression above; the
+        # gathers write straight into the buffers (no full-size temporaries)
+        if out is None:
+            out = np.empty(wts.shape[1:], dtype=img.dtype)
+        if scratch is None:
+            scratch = np.empty_like(out)
+        np.take(flat, idx[0], out=out, mode="clip")
+        out *= wts[0]
+        for k in (1, 2, 3):
+            np.take(flat, idx[k], out=scratch, mode="clip")
+            scratch *= wts[k]
+            out += scratch
 
     # 越界处用 fill 覆盖 / overwrite OOB with fill
-    outside = (xs < 0) | (xs > (w - 1)) | (ys < 0) | (ys > (h - 1))
     if np.any(outside):
-        out = out.astype(np.float64, copy=False)
+        if not np.issubdtype(out.dtype, np.floating):
+            out = out.astype(np.float64)
         out[outside] = fill
 
     return out
@@ -145,7 +264,42 @@ def sample_bilinear(img: np.ndarray, xs: np.ndarray, ys: np.ndarray, fill: float
 # 4) 旋转：逆映射 + 双线性插值（中心旋转）
 #    Rotation via inverse mapping + bilinear interpolation (around center)
 # ===========================================================
-def rotate_image_bilinear(img: np.ndarray, angle_deg: float, fill: float = 0.0) -> np.ndarray:
+def inverse_rotation_coords(h: int, w: int, angle_deg: float, rows=None):
+    """
+    计算输出网格 (H, W) 上每个像素在源图像中的逆旋转坐标。
+    Source coordinates of every output pixel under an inverse rotation.
+
+    rows : (r0, r1) or None
+        只计算输出行 r0:r1（逐元素结果与整幅计算相同）。
+        Only output rows r0:r1 (element-wise identical to the full grid).
+
+    Returns
+    -------
+    xs, ys : np.ndarray (H, W) or (r1 - r0, W)
+        源图像坐标（浮点） / float source coordinates.
+    """
+    cy, cx = (h - 1) / 2.0, (w - 1) / 2.0
+    r0, r1 = (0, h) if rows is None else rows
+
+    theta = math.radians(angle_deg)
+    cos_t, sin_t = math.cos(theta), math.sin(theta)
+
+    # 输出网格（目标像素坐标）：行、列分别广播，不分配完整 meshgrid
+    # Output grid as a broadcast row and column (no full meshgrids)
+    x_rel = (np.arange(w) - cx)[None, :]
+    y_rel = (np.arange(r0, r1) - cy)[:, None]
+
+    # 逆映射：输出 -> 输入（先平移到中心，再逆旋转，最后平移回去）
+    # Inverse mapping: (x', y') -> (x, y); the final shift is in place
+    xs =  cos_t * x_rel + sin_t * y_rel
+    xs += cx
+    ys = -sin_t * x_rel + cos_t * y_rel
+    ys += cy
+    return xs, ys
+
+
+def rotate_image_bilinear(img: np.ndarray, angle_deg: float, fill: float = 0.0,
+                          out: np.ndarray = None, scratch: np.ndarray = None) -> np.ndarray:
     """
     将图像围绕几何中心旋转 angle_deg（逆时针），使用逆映射和双线性插值。
     Rotate the image counter-clockwise by angle_deg using inverse mapping.
@@ -154,41 +308,454 @@ def rotate_image_bilinear(img: np.ndarray, angle_deg: float, fill: float = 0.0)
     - 图像坐标 y 轴向下；这里采用标准逆旋转矩阵 R(-θ) 做反向采样。
       Image coordinates have y downwards; we apply inverse rotation R(-θ).
 
+    out, scratch : np.ndarray (H, W) or None
+        可选的预分配缓冲，见 sample_bilinear / optional buffers, see sample_bilinear.
+
+    Returns
+    -------
+    rot : np.ndarray (H, W)
+        旋转后的图像（与输入同尺寸；float32 输入保持 float32，其余为 float64）
+        rotated image with same shape (float32 stays float32, else float64).
+    """
+    h, w = img.shape
+    xs, ys = inverse_rotation_coords(h, w, angle_deg)
+
+    rot = sample_bilinear(img, xs, ys, fill=fill, out=out, scratch=scratch)
+    if rot.dtype != np.float32:
+        rot = rot.astype(np.float64, copy=False)
+    return rot
+
+
+def _shear_lines(src: np.ndarray, out: np.ndarray, t: np.ndarray, d: int) -> None:
+    """
+    一次 1-D 剪切：out[i, j] = src[i + d, j + t[i]]（沿轴 1 线性插值），
+    采样越界的位置保持 out 原值（调用方预先填充 fill）。
+    整数位移相同的连续行成组处理，每组只做两次连续切片读取。
+    One 1-D shear: out[i, j] = src[i + d, j + t[i]], linearly interpolated
+    along axis 1; out-of-range samples keep out's prefilled value. Rows
+    sharing an integer shift are handled as one block of contiguous slices.
+    src/out 可以是转置视图（用于沿列的剪切）/ src/out may be transposed views.
+    """
+    n_out, w_out = out.shape
+    n_src, w_src = src.shape
+    i_lo, i_hi = max(0, -d), min(n_out, n_src - d)
+    if i_lo >= i_hi:
+        return
+    t = t[i_lo:i_hi]
+    k = np.floor(t).astype(np.int64)
+    f = t - k
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(k)) + 1))
+    ends = np.append(starts[1:], len(k))
+
+    for a, b in zip(starts, ends):
+        kk = int(k[a])
+        i0, i1 = i_lo + a, i_lo + b
+        fa = f[a:b, None]
+        # 双抽头区间：x + k ∈ [0, w_src − 2] / two-tap range
+        lo, hi = max(0, -kk), min(w_out, w_src - 1 - kk)
+        if lo < hi:
+            dst = out[i0:i1, lo:hi]
+            np.multiply(src[i0 + d:i1 + d, lo + kk:hi + kk], 1.0 - fa, out=dst)
+            dst += src[i0 + d:i1 + d, lo + kk + 1:hi + kk + 1] * fa
+        # 整数位移时最后一列恰好落在边界上 / exact hit on the last column when f == 0
+        x_edge = w_src - 1 - kk
+        if 0 <= x_edge < w_out:
+            rows = np.flatnonzero(f[a:b] == 0.0) + i0
+            out[rows, x_edge] = src[rows + d, w_src - 1]
+
+
+def rotate_image_shear(img: np.ndarray, angle_deg: float, fill: float = 0.0,
+                       out: np.ndarray = None) -> np.ndarray:
+    """
+    三次 1-D 剪切实现的旋转（Paeth 分解），几何约定与 rotate_image_bilinear 相同：
+    R(θ) = X(a)·Y(b)·X(a)，a = tan(θ/2)，b = −sin θ；每次剪切都是整行
+    （或整列块）的连续平移 + 线性插值，不做随机 gather。
+    正方形图先用 np.rot90 精确处理 90° 的倍数，剩余 |φ| ≤ 45°；非正方形图
+    用精确的 180° 翻转，剩余 |φ| ≤ 90°。中间结果放在扩大的画布上，不会裁掉内容。
+    Rotation from three 1-D shears (Paeth), with the same geometry as
+    rotate_image_bilinear: R(θ) = X(a)·Y(b)·X(a), a = tan(θ/2), b = −sin θ.
+    Every shear is a contiguous shift of whole rows (or column blocks) with
+    linear interpolation, so there are no random gathers. Square images
+    take multiples of 90° exactly with np.rot90, leaving |φ| ≤ 45°;
+    non-square ones use an exact 180° flip, leaving |φ| ≤ 90°.
+    Intermediate passes use enlarged canvases, so nothing is clipped.
+
+    精度 / accuracy:
+    三次线性插值比一次双线性略平滑。相对 rotate_image_bilinear 的正弦图误差
+    （pad + FOV、fill=0）：带限内容（缺陷斑块）rel-L2 ≈ 1e-3，噪声图 ≲ 1.5e-2，
+    1 像素细线 ≲ 5e-2；90° 的倍数处完全一致。fill ≠ 0 时图像边界处另有
+    ~1 像素的混合差异。
+    Three linear passes smooth slightly more than one bilinear pass.
+    Sinogram error against rotate_image_bilinear (pad + FOV, fill=0):
+    rel-L2 ≈ 1e-3 on band-limited content (blobs), ≲ 1.5e-2 on noise maps
+    and ≲ 5e-2 on one-pixel lines; exact at multiples of 90°. With
+    fill ≠ 0 the image border also differs by about one pixel of blending.
+
     Returns
     -------
     rot : np.ndarray (H, W)
-        旋转后的图像（与输入同尺寸） / rotated image with same shape.
+        与 rotate_image_bilinear 相同的 dtype 规则 / same dtype rule as
+        rotate_image_bilinear.
     """
     h, w = img.shape
+    dtype = np.float32 if img.dtype == np.float32 else np.float64
+    src = img.astype(dtype, copy=False)
+    if out is None:
+        out = np.empty((h, w), dtype=dtype)
+
+    theta = float(np.mod(angle_deg, 360.0))
+    if h == w:
+        q = int(np.floor(theta / 90.0 + 0.5)) % 4
+        phi = theta - 90.0 * q
+        if phi > 180.0:
+            phi -= 360.0
+        src = np.rot90(src, -q)
+    else:
+        flip = 90.0 < theta <= 270.0
+        phi = theta - 180.0 if flip else (theta - 360.0 if theta > 270.0 else theta)
+        if flip:
+            src = src[::-1, ::-1]
+
+    if phi == 0.0:
+        out[...] = src
+        return out
+
+    a = math.tan(math.radians(phi) / 2.0)
+    b = -math.sin(math.radians(phi))
     cy, cx = (h - 1) / 2.0, (w - 1) / 2.0
+    m2 = int(math.ceil(abs(a) * cy)) + 1       # J2 左右扩展 / J2 column margin
+    w2 = w + 2 * m2
+    cx2 = cx + m2
+    m1 = int(math.ceil(abs(b) * cx2)) + 1      # J1 上下扩展 / J1 row margin
+    h1 = h + 2 * m1
+    cy1 = cy + m1
 
-    theta = math.radians(angle_deg)
-    cos_t, sin_t = math.cos(theta), math.sin(theta)
+    # J1(u) = I(u_x + a·u_y, u_y)
+    j1 = np.full((h1, w2), fill, dtype=dtype)
+    _shear_lines(src, j1, -m2 + a * (np.arange(h1) - cy1), -m1)
+    # J2(v) = J1(v_x, v_y + b·v_x)：对转置视图做行剪切 / row shear on transposed views
+    j2 = np.full((h, w2), fill, dtype=dtype)
+    _shear_lines(j1.T, j2.T, m1 + b * (np.arange(w2) - cx2), 0)
+    # out(p) = J2(p_x + a·p_y, p_y)
+    out[...] = fill
+    _shear_lines(j2, out, m2 + a * (np.arange(h) - cy), 0)
+    return out
 
-    # 构建输出网格（目标像素坐标） / build output grid
-    yy, xx = np.meshgrid(np.arange(h), np.arange(w), indexing="ij")
 
-    # 逆映射：输出 -> 输入（先平移到中心，再逆旋转，最后平移回去）
-    # Inverse mapping: (x', y') -> (x, y)
-    x_rel = xx - cx
-    y_rel = yy - cy
-    xs =  cos_t * x_rel + sin_t * y_rel + cx
-    ys = -sin_t * x_rel + cos_t * y_rel + cy
+# ===========================================================
+# 5) 旋转几何缓存（角点索引 + 打包权重，按字节数 LRU）
+#    Cached rotation geometry (corner indices + packed weights, byte-bounded LRU)
+# ===========================================================
+class RotationGeometry:
+    """
+    某一 (尺寸, 角度, dtype) 下双线性旋转的预计算几何：
+    左上角点的展平索引（int32）、四个角点的打包权重（越界处为 0）
+    以及越界采样的位置。其余三个角点通过偏移 +1、+W、+W+1 得到。
+    Precomputed bilinear rotation geometry for one (shape, angle, dtype):
+    int32 flat index of the top-left corner, packed weights of the four
+    corners (zero where out of bounds) and the out-of-bound positions. The
+    other corners sit at offsets +1, +W and +W+1.
+    """
+
+    def __init__(self, h: int, w: int, angle_deg: float, dtype=np.float64):
+        self.shape = (h, w)
+        xs, ys = inverse_rotation_coords(h, w, angle_deg)
+        idx, wts, outside = bilinear_taps(h, w, xs.ravel(), ys.ravel(), dtype=dtype)
+
+        # 越界采样：索引指向 0，权重置 0，最后统一写 fill
+        # Out-of-bound samples: index 0, zero weights, fill written afterwards
+        self.base = np.where(outside, 0, idx[0]).astype(np.int32)
+        wts[:, outside] = 0.0
+        self.weights = wts
+        self.outside = np.flatnonzero(outside).astype(np.int32)
+        self.nbytes = self.base.nbytes + self.weights.nbytes + self.outside.nbytes
+
+    def sample(self, guarded: np.ndarray, fill: float = 0.0,
+               out: np.ndarray = None, scratch: np.ndarray = None) -> np.ndarray:
+        """
+        融合的 gather + 加权：guarded 为 guard_flat 的结果，可为 (H·W+W+1,)
+        或批量 (B, H·W+W+1)。
+        Fused gather-and-weight on guard_flat output, 1-D or batched (B, ·).
+
+        Returns
+        -------
+        out : np.ndarray (H·W,) or (B, H·W)
+        """
+        h, w = self.shape
+        n = h * w
+        axis = guarded.ndim - 1
+        if out is None:
+            out = np.empty(guarded.shape[:-1] + (n,), dtype=self.weights.dtype)
+        if scratch is None:
+            scratch = np.empty_like(out)
+
+        # 与 sample_bilinear 相同的求值顺序 / same evaluation order as sample_bilinear
+        np.take(guarded, self.base, axis=axis, out=out, mode="clip")
+        out *= self.weights[0]
+        for k, offset in ((1, 1), (2, w), (3, w + 1)):
+            np.take(guarded[..., offset:], self.base, axis=axis, out=scratch, mode="clip")
+            scratch *= self.weights[k]
+            out += scratch
+
+        if len(self.outside):
+            out[..., self.outside] = fill
+        return out
+
+
+class GeometryCache:
+    """
+    按 (H, W, 角度, dtype) 缓存 RotationGeometry，总字节数超过 max_bytes
+    时按最近最少使用（LRU）淘汰。线程安全。
+    Byte-bounded LRU cache of RotationGeometry keyed by (H, W, angle, dtype).
+    Thread-safe.
+
+    每个条目约 36 B/像素（float64）或 20 B/像素（float32）；
+    例如 1415×1415、180 个角度（float32）约需 7 GB，角度数超过容量时
+    LRU 会逐轮全部失效，应按需设置 max_bytes 或减少角度。
+    Each entry costs ~36 B/pixel (float64) or ~20 B/pixel (float32), e.g.
+    ~7 GB for 1415² × 180 angles in float32; if the angle set does not fit,
+    LRU misses on every pass, so size max_bytes accordingly.
+    """
+
+    def __init__(self, max_bytes: int = 1 << 30):
+        from collections import OrderedDict
+
+        self.max_bytes = int(max_bytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, h: int, w: int, angle_deg: float, dtype=np.float64) -> RotationGeometry:
+        key = (int(h), int(w), float(angle_deg), np.dtype(dtype).str)
+        with self._lock:
+            geo = self._entries.get(key)
+            if geo is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return geo
+            self.misses += 1
+
+        geo = RotationGeometry(h, w, angle_deg, dtype=dtype)
+        with self._lock:
+            if key not in self._entries and geo.nbytes <= self.max_bytes:
+                self._entries[key] = geo
+                self.nbytes += geo.nbytes
+                while self.nbytes > self.max_bytes:
+                    _, old = self._entries.popitem(last=False)
+                    self.nbytes -= old.nbytes
+        return geo
 
-    rot = sample_bilinear(img, xs, ys, fill=fill)
-    return rot.astype(np.float64, copy=False)
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def guard_flat(work: np.ndarray) -> np.ndarray:
+    """
+    将 (H, W) 或 (B, H, W) 图像展平并在末尾补 W+1 个零，使 RotationGeometry
+    的 +1/+W/+W+1 偏移不越界。
+    Flatten (H, W) or (B, H, W) and append W+1 zeros so the corner offsets
+    used by RotationGeometry stay in range.
+    """
+    h, w = work.shape[-2:]
+    lead = work.shape[:-2]
+    guarded = np.zeros(lead + (h * w + w + 1,), dtype=work.dtype)
+    guarded[..., :h * w] = work.reshape(lead + (h * w,))
+    return guarded
+
+
+# ===========================================================
+# 6) 分阶段性能剖析（可选；未启用时为空操作）
+#    Opt-in per-stage profiling (a no-op when disabled)
+# ===========================================================
+_ACTIVE_PROFILER = None
+_NO_STAGE = contextlib.nullcontext()
+
+
+def profile_stage(name: str, angle=None, nbytes: int = 0):
+    """
+    标记一个流水线阶段；未启用 RadonProfiler 时返回共享的空上下文，几乎零开销。
+    Mark a pipeline stage; returns a shared null context (essentially free)
+    unless a RadonProfiler is active.
+    """
+    prof = _ACTIVE_PROFILER
+    if prof is None:
+        return _NO_STAGE
+    return prof.stage(name, angle, nbytes)
+
+
+class RadonProfiler:
+    """
+    记录各阶段（pad / fov / rotate / sum / ...）与各角度的耗时、字节数与调用次数。
+    以 with 语句启用（对本进程内所有线程生效；进程池子进程不记录）。
+    Record wall time, bytes and call counts per stage and per angle. Enabled
+    with a `with` block for every thread in this process (process-pool
+    children are not recorded).
+
+    Parameters
+    ----------
+    trace_memory : bool
+        True 则用 tracemalloc 测量各阶段新分配的峰值字节（有开销，嵌套阶段为近似值）；
+        False 时 bytes 为阶段自报的输出大小。
+        Measure each stage's allocation peak with tracemalloc (slower;
+        approximate for nested stages); otherwise bytes is the output size
+        reported by the stage.
+    callback : callable or None
+        每个事件结束时调用 callback(event) / called with each finished event.
+
+    Examples
+    --------
+    >>> with RadonProfiler() as prof:
+    ...     radon_transform_s_theta(img, angles)
+    >>> prof.summary()["rotate"]["seconds"]
+    >>> prof.save_chrome_trace("radon_trace.json")   # chrome://tracing / Perfetto
+    """
+
+    def __init__(self, trace_memory: bool = False, callback=None):
+        self.trace_memory = trace_memory
+        self.callback = callback
+        self.events = []
+        self._t0 = time.perf_counter()
+        self._previous = None
+        self._started_tracing = False
+
+    def __enter__(self):
+        global _ACTIVE_PROFILER
+        self._previous = _ACTIVE_PROFILER
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        _ACTIVE_PROFILER = self
+        return self
+
+    def __exit__(self, *exc):
+        global _ACTIVE_PROFILER
+        _ACTIVE_PROFILER = self._previous
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return False
+
+    @contextlib.contextmanager
+    def stage(self, name: str, angle=None, nbytes: int = 0):
+        """计时一个阶段并追加事件 / time one stage and append its event."""
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            mem0 = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            t1 = time.perf_counter()
+            if self.trace_memory:
+                nbytes = max(int(nbytes), tracemalloc.get_traced_memory()[1] - mem0)
+            event = {"name": name,
+                     "start": t0 - self._t0,
+                     "seconds": t1 - t0,
+                     "bytes": int(nbytes),
+                     "angle": None if angle is None else float(angle),
+                     "thread": threading.get_ident()}
+            self.events.append(event)
+            if self.callback is not None:
+                self.callback(event)
+
+    def summary(self) -> dict:
+        """{stage: {"calls", "seconds", "bytes"}}（各阶段累计）/ per-stage totals."""
+        out = {}
+        for e in self.events:
+            s = out.setdefault(e["name"], {"calls": 0, "seconds": 0.0, "bytes": 0})
+            s["calls"] += 1
+            s["seconds"] += e["seconds"]
+            s["bytes"] += e["bytes"]
+        return out
+
+    def per_angle(self) -> dict:
+        """{angle_deg: {stage: seconds}}（仅含带角度的事件）/ per-angle stage times."""
+        out = {}
+        for e in self.events:
+            if e["angle"] is not None:
+                stages = out.setdefault(e["angle"], {})
+                stages[e["name"]] = stages.get(e["name"], 0.0) + e["seconds"]
+        return out
+
+    def chrome_trace(self) -> dict:
+        """Chrome Trace Event 格式（完整事件 "X"，微秒）/ Chrome trace event format."""
+        pid = os.getpid()
+        events = []
+        for e in self.events:
+            args = {"bytes": e["bytes"]}
+            if e["angle"] is not None:
+                args["angle"] = e["angle"]
+            events.append({"name": e["name"], "cat": "radon", "ph": "X",
+                           "ts": e["start"] * 1e6, "dur": e["seconds"] * 1e6,
+                           "pid": pid, "tid": e["thread"], "args": args})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save_chrome_trace(self, path: str) -> None:
+        """写出 JSON，可在 chrome://tracing 或 Perfetto 中查看火焰图。
+        Write the trace JSON for chrome://tracing or Perfetto."""
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
 
 
 # ===========================================================
-# 5) Radon 变换（旋转 + 列求和）
+# 7) Radon 变换（旋转 + 列求和）
 #    Radon transform via rotate-and-sum
 #    —— 输出即为 (s, θ)：行=s、列=θ
 # ===========================================================
+def prepare_work_image(img: np.ndarray,
+                       use_circular_fov: bool = True,
+                       pad: bool = True,
+                       fill: float = 0.0,
+                       dtype=np.float64) -> np.ndarray:
+    """
+    转为 dtype（默认 float64），按需 pad 到对角线并裁切内切圆，得到旋转用的工作图。
+    Convert to `dtype` (float64 by default), optionally pad to the diagonal
+    and apply the FOV.
+    """
+    with profile_stage("cast"):
+        work = img.astype(dtype, copy=False)
+
+    # 可选：先 pad 再裁切内切圆，减少边缘伪影
+    if pad:
+        with profile_stage("pad"):
+            work = pad_to_diagonal(work, fill=fill)
+    if use_circular_fov:
+        with profile_stage("fov"):
+            # pad / 类型转换已产生新数组时原地裁切 / mask in place on our own copy
+            work = apply_circular_fov(work, out=None if work is img else work)
+    return work
+
+
+def detector_coords(num_s: int) -> np.ndarray:
+    """
+    探测器坐标 s：以中心 0 对齐，从负到正均匀采样。
+    Detector coordinates centered at 0, increasing.
+    """
+    return np.linspace(-(num_s - 1) / 2.0,
+                        (num_s - 1) / 2.0,
+                        num_s, dtype=np.float64)
+
+
 def radon_transform_s_theta(img: np.ndarray,
                             angles_deg,
                             use_circular_fov: bool = True,
                             pad: bool = True,
-                            fill: float = 0.0):
+                            fill: float = 0.0,
+                            workers=None,
+                            executor: str = "thread",
+                            method: str = "rotate",
+                            dtype=np.float64,
+                            accum_dtype=None,
+                            geometry_cache=None,
+                            symmetry: bool = True,
+                            max_bytes=None):
     """
     通过"旋转 + 按列求和"来近似计算 Radon 投影。
     Approximate the Radon transform via rotation + column-wise sums.
@@ -208,6 +775,72 @@ def radon_transform_s_theta(img: np.ndarray,
         Pad to diagonal to avoid cropping if True.
     fill : float
         旋转采样越界时的填充值 / fill value for out-of-bound sampling.
+    workers : int or None
+        并行工作数；None/1 为单核，-1 使用全部 CPU。角度集合被切分给各工作者。
+        Number of parallel workers; None/1 runs serially, -1 uses all CPUs.
+        The angle set is split across workers.
+    executor : {"thread", "process"}
+        "thread" 使用线程池（NumPy 在大规模 gather 时释放 GIL）；
+        "process" 使用进程池 + 共享内存输入/输出缓冲区。
+        "thread" uses a thread pool (NumPy releases the GIL in the heavy
+        gathers); "process" uses a process pool with shared-memory buffers.
+    method : {"rotate", "shear", "fourier", "ray", "sparse"}
+        "rotate"：旋转 + 列求和（默认）；"shear"：三次 1-D 剪切旋转，访存连续，
+        大图上快 2–3 倍（误差见 rotate_image_shear）；"fourier"：基于投影切片
+        定理的 FFT 实现，角度较密时快一个数量级以上（精度见 fourier_slice_projections）；
+        "ray"：射线驱动投影，只在 FOV/原图支撑内采样，结果与 "rotate" 一致；
+        "sparse"：只把非零像素线性散射到 (s, θ)，适合几乎全零的掩膜（要求 fill=0，
+        精度见 sparse_projections）。
+        "rotate" is rotate-and-sum (default); "shear" rotates with three
+        cache-friendly 1-D shears, 2–3× faster on large maps (tolerance in
+        rotate_image_shear); "fourier" uses the projection-slice theorem
+        and is much faster for dense angle sets; "ray" samples
+        only inside the FOV / map support and matches "rotate"; "sparse"
+        scatters only the nonzero pixels, for mostly-empty masks (fill must
+        be 0; see sparse_projections for accuracy).
+    dtype : numpy dtype
+        工作精度（float64 或 float32）。float32 时 pad、采样与累加全程保持
+        float32（角点索引为 int32、权重为 float32，坐标仍为 float64）；
+        实测 1000² 图、10 个角度：峰值内存 183 MiB（float64 为 237 MiB），
+        耗时约快 20%。
+        Working precision; float32 is carried through padding, sampling and
+        accumulation (int32 tap indices and float32 weights; coordinates
+        stay float64). Measured on a 1000² map with 10 angles: 183 MiB peak
+        versus 237 MiB for float64, and about 20% faster.
+    accum_dtype : numpy dtype or None
+        列求和的累加精度，也是输出 sinogram 的 dtype；None 表示与 dtype 相同。
+        可设为 float64，仅在求和时使用双精度。
+        Dtype of the column sums and of the returned sinogram; None means
+        `dtype`. Use float64 to accumulate in double precision only there.
+    geometry_cache : GeometryCache or None
+        "rotate" 方法下复用各角度的双线性几何（角点索引与权重），
+        同一几何的重复变换只做融合 gather + 加权。
+        Reuse per-angle bilinear geometry for method "rotate"; repeated
+        transforms at the same geometry only do a fused gather-and-weight.
+    symmetry : bool
+        True 则利用 p(s, θ+180°) = p(−s, θ) 只计算不重复的半圈角度，其余
+        沿 s 翻转得到；工作图为正方形时 0°/90° 的倍数直接用行/列求和（精确、
+        几乎无代价）。
+        Use p(s, θ+180°) = p(−s, θ) to compute only the unique half-turn
+        angles and flip the rest along s; on a square work image multiples
+        of 90° use exact row/column sums instead of resampling.
+        注：逐角度旋转时 sin/cos 的舍入（如 sin 180° ≈ 1.2e-16）会使边缘列
+        的部分采样被误判越界；折叠后的结果不受此影响。
+        Note: with per-angle rotation, rounding of sin/cos (e.g. sin 180° ≈
+        1.2e-16) misclassifies some edge-column samples as out of bounds;
+        folded results do not have this artifact.
+    max_bytes : int or None
+        内存预算（字节）。给定时按输出行带分块旋转、逐带累加列和，使工作图、
+        正弦图与临时缓冲的总量不超过该值（不含输入图像本身）；结果与不分块时
+        逐位一致。仅支持 method="rotate" 且串行执行（不使用 geometry_cache）；
+        预算连一行都容纳不下时抛出 ValueError。适合 8k 以上的大尺寸晶圆图。
+        Memory budget in bytes. When given, each angle is rotated in bands
+        of output rows whose column sums are accumulated, keeping the work
+        image, sinogram and temporaries (not the input image) under this
+        budget; the output is bit-identical to the untiled path. Requires
+        method="rotate" and serial execution (geometry_cache is not used);
+        raises ValueError if not even one row band fits. Meant for 8k+
+        wafer maps.
 
     Returns
     -------
@@ -228,115 +861,2456 @@ def radon_transform_s_theta(img: np.ndarray,
       Complexity O(HW × Nθ).
     """
     assert img.ndim == 2, "img must be 2D"
-    work = img.astype(np.float64, copy=False)
+    angles_deg = np.asarray(list(angles_deg), dtype=np.float64)
+    angles_rad = np.deg2rad(angles_deg)
+    accum_dtype = np.dtype(dtype if accum_dtype is None else accum_dtype)
 
-    # 可选：先 pad 再裁切内切圆，减少边缘伪影
-    if pad:
-        work = pad_to_diagonal(work, fill=fill)
-    if use_circular_fov:
-        work = apply_circular_fov(work)
+    band_rows = None
+    if max_bytes is not None:
+        if method != "rotate":
+            raise ValueError("max_bytes requires method 'rotate'")
+        if workers not in (None, 1):
+            raise ValueError("max_bytes runs serially; use workers=None")
+        # 先按预期尺寸检查预算，避免分配工作图后才失败 / check before allocating
+        side = int(math.ceil(math.sqrt(img.shape[0] ** 2 + img.shape[1] ** 2)))
+        wh, ww = (side, side) if pad else img.shape
+        sino_bytes = ww * len(angles_deg) * accum_dtype.itemsize
+        fixed = wh * ww * np.dtype(dtype).itemsize + (3 if symmetry else 1) * sino_bytes
+        if use_circular_fov:
+            fixed += 2 * wh * ww                               # FOV 掩膜及行区间临时量 / FOV mask + spans
+        if img.dtype != dtype:
+            fixed += img.size * np.dtype(dtype).itemsize       # 类型转换副本 / cast copy
+        band_rows = tile_rows(ww, max_bytes, fixed_bytes=fixed)
+
+    work = prepare_work_image(img, use_circular_fov=use_circular_fov, pad=pad,
+                              fill=fill, dtype=dtype)
 
     h, w = work.shape
     num_s = w  # 对"旋转后按列求和"，探测器数量等于宽度
-    angles_deg = np.asarray(list(angles_deg), dtype=np.float64)
-    angles_rad = np.deg2rad(angles_deg)
 
     # 直接按 (s, θ) 排布分配结果矩阵
-    sinogram = np.zeros((num_s, len(angles_deg)), dtype=np.float64)
+    sinogram = np.zeros((num_s, len(angles_deg)), dtype=accum_dtype)
+
+    if symmetry:
+        unique, src, flip = fold_half_turn(angles_deg)
+        base = np.zeros((num_s, len(unique)), dtype=accum_dtype)
+
+        # 轴对齐角度：精确行/列求和 / axis-aligned angles: exact sums
+        exact = np.isin(unique, (0.0, 90.0)) if h == w else np.zeros(len(unique), dtype=bool)
+        for k in np.flatnonzero(exact):
+            with profile_stage("axis_sum", angle=unique[k]):
+                base[:, k] = axis_aligned_projection(work, unique[k], dtype=accum_dtype)
+
+        rest = np.flatnonzero(~exact)
+        if len(rest):
+            part = np.zeros((num_s, len(rest)), dtype=accum_dtype)
+            project_work(work, unique[rest], part, img.shape, method=method,
+                         use_circular_fov=use_circular_fov, pad=pad, fill=fill,
+                         workers=workers, executor=executor,
+                         geometry_cache=geometry_cache, band_rows=band_rows)
+            base[:, rest] = part
+
+        # 展开回请求的角度，θ+180° 的列沿 s 翻转 / expand, flipping θ+180° along s
+        with profile_stage("unfold", nbytes=sinogram.nbytes):
+            sinogram[:] = base[:, src]
+            sinogram[:, flip] = sinogram[::-1, flip]
+    else:
+        project_work(work, angles_deg, sinogram, img.shape, method=method,
+                     use_circular_fov=use_circular_fov, pad=pad, fill=fill,
+                     workers=workers, executor=executor,
+                     geometry_cache=geometry_cache, band_rows=band_rows)
+
+    return sinogram, detector_coords(num_s), angles_rad
+
+
+def project_work(work: np.ndarray, angles_deg: np.ndarray, sinogram: np.ndarray,
+                 image_shape, method: str = "rotate",
+                 use_circular_fov: bool = True, pad: bool = True, fill: float = 0.0,
+                 workers=None, executor: str = "thread", geometry_cache=None,
+                 band_rows=None) -> None:
+    """
+    按 method 分派投影计算，结果写入预分配的 sinogram (W, num_angles)。
+    band_rows 给定时 "rotate" 按行带分块执行（见 project_angles_tiled）。
+    Dispatch projection by `method` into the preallocated sinogram; with
+    `band_rows`, "rotate" runs in row bands (see project_angles_tiled).
+    """
+    h, w = work.shape
+    if method == "fourier":
+        with profile_stage("fourier", nbytes=sinogram.nbytes):
+            sinogram[:] = fourier_slice_projections(work, angles_deg)
+            if fill != 0.0:
+                sinogram += fill * oob_sample_counts(h, w, angles_deg)
+    elif method == "ray":
+        with profile_stage("ray", nbytes=sinogram.nbytes):
+            sinogram[:] = ray_projections(work, angles_deg, fill=fill,
+                                          use_circular_fov=use_circular_fov,
+                                          support_rect=work_support_rect(image_shape,
+                                                                         work.shape, pad, fill))
+    elif method == "sparse":
+        if fill != 0.0:
+            raise ValueError("method 'sparse' requires fill == 0")
+        with profile_stage("sparse", nbytes=sinogram.nbytes):
+            ys, xs = np.nonzero(work)
+            sinogram[:] = sparse_projections(ys, xs, work[ys, xs], work.shape, angles_deg,
+                                             crop=not use_circular_fov)
+    elif method not in ("rotate", "shear"):
+        raise ValueError(f"unknown method: {method!r}")
+    elif band_rows is not None and method == "rotate":
+        project_angles_tiled(work, angles_deg, sinogram, range(len(angles_deg)),
+                             rows=band_rows, fill=fill)
+    elif workers is None or workers == 1:
+        project_angles(work, angles_deg, sinogram, range(len(angles_deg)), fill=fill,
+                       geometry_cache=geometry_cache, method=method)
+    else:
+        run_angle_parallel(work, angles_deg, sinogram, fill=fill,
+                           workers=workers, executor=executor,
+                           geometry_cache=geometry_cache, method=method)
+
+
+def fold_half_turn(angles_deg: np.ndarray):
+    """
+    将角度折叠到 [0°, 180°)：θ 与 θ+180° 只保留一个。
+    Fold angles into [0°, 180°), keeping one of θ and θ+180°.
+
+    Returns
+    -------
+    unique : np.ndarray
+        需要实际计算的角度（升序，度） / angles to compute (ascending, degrees).
+    src : np.ndarray (num_angles,) int
+        每个请求角度对应的 unique 索引 / unique index of each requested angle.
+    flip : np.ndarray (num_angles,) bool
+        是否需要沿 s 翻转（θ 落在 [180°, 360°)） / whether to flip along s.
+    """
+    wrapped = np.round(np.mod(angles_deg, 360.0), 9) % 360.0
+    flip = wrapped >= 180.0
+    unique, src = np.unique(wrapped - 180.0 * flip, return_inverse=True)
+    return unique, src.reshape(-1), flip
+
+
+def axis_aligned_projection(work: np.ndarray, angle_deg: float, dtype=None) -> np.ndarray:
+    """
+    正方形工作图在 0° / 90° 的精确投影：0° 为按列求和，90° 为按行求和后反转
+    （与 rotate_image_bilinear 的几何一致）。
+    Exact projection of a square work image at 0° (column sums) or 90°
+    (reversed row sums), matching the rotate_image_bilinear geometry.
+    """
+    if angle_deg == 0.0:
+        return work.sum(axis=0, dtype=dtype)
+    if angle_deg == 90.0:
+        return work.sum(axis=1, dtype=dtype)[::-1]
+    raise ValueError(f"not an axis-aligned angle: {angle_deg!r}")
+
+
+def project_angles(work: np.ndarray, angles_deg: np.ndarray, sinogram: np.ndarray,
+                   cols, fill: float = 0.0, geometry_cache=None,
+                   method: str = "rotate") -> None:
+    """
+    对 cols 指定的角度列计算投影，直接写入预分配的 sinogram[:, j]。
+    旋转结果与 gather 临时缓冲只分配一次，在各角度间复用；列求和按
+    sinogram.dtype 累加。给定 geometry_cache 时从缓存取几何，只做融合
+    gather + 加权。method="shear" 时改用 rotate_image_shear（不使用几何缓存）。
+    Project the angle columns in `cols`, writing into sinogram[:, j] in place.
+    The rotation output and gather buffers are allocated once and reused
+    across angles; column sums accumulate in sinogram.dtype. With a
+    geometry_cache only the fused gather-and-weight runs per angle.
+    method="shear" rotates with rotate_image_shear instead (no geometry cache).
+    """
+    h, w = work.shape
+    buf_dtype = np.float32 if work.dtype == np.float32 else np.float64
+    rot = np.empty(work.shape, dtype=buf_dtype)
+    scratch = np.empty_like(rot)
+    if geometry_cache is not None:
+        guarded = guard_flat(work.astype(buf_dtype, copy=False))
 
     # 对每个角度：旋转 -> 按列求和（即对 y 求和）
-    for j, ang in enumerate(angles_deg):
-        rot = rotate_image_bilinear(work, ang, fill=fill)  # (H, W)
-        proj = rot.sum(axis=0)                             # (W,) = (num_s,)
-        sinogram[:, j] = proj
+    for j in cols:
+        with profile_stage("rotate", angle=angles_deg[j], nbytes=rot.nbytes):
+            if method == "shear":
+                rotate_image_shear(work, angles_deg[j], fill=fill, out=rot)
+            elif geometry_cache is None:
+                rotate_image_bilinear(work, angles_deg[j], fill=fill, out=rot, scratch=scratch)  # (H, W)
+            else:
+                geo = geometry_cache.get(h, w, angles_deg[j], dtype=buf_dtype)
+                geo.sample(guarded, fill=fill, out=rot.reshape(-1), scratch=scratch.reshape(-1))
+        with profile_stage("sum", angle=angles_deg[j]):
+            sinogram[:, j] = rot.sum(axis=0, dtype=sinogram.dtype)                           # (W,) = (num_s,)
+
+
+# 行带模式下每个输出像素的临时内存上界（坐标、角点索引/权重、gather 缓冲与部分和），
+# 由 tracemalloc 实测（约 200 B）后取整留余量
+# Upper bound of band-mode temporaries per output pixel (coordinates, tap
+# indices/weights, gather buffers, partial sums); measured ~200 B with
+# tracemalloc, rounded up.
+TILE_BYTES_PER_PIXEL = 256
 
-    # 探测器坐标 s：以中心 0 对齐，从负到正均匀采样
-    s_coords = np.linspace(-(num_s - 1) / 2.0,
-                            (num_s - 1) / 2.0,
-                            num_s, dtype=np.float64)
-    return sinogram, s_coords, angles_rad
+
+def tile_rows(width: int, max_bytes: int, fixed_bytes: int = 0) -> int:
+    """
+    在 max_bytes 预算内（扣除 fixed_bytes 常驻内存）每个行带可容纳的输出行数。
+    Output rows per band that fit in `max_bytes` after `fixed_bytes` of
+    resident buffers (work image, sinogram).
+    """
+    rows = (int(max_bytes) - int(fixed_bytes)) // (width * TILE_BYTES_PER_PIXEL)
+    if rows < 1:
+        need = int(fixed_bytes) + width * TILE_BYTES_PER_PIXEL
+        raise ValueError(f"max_bytes={max_bytes} is too small: at least {need} bytes are "
+                         f"needed for the work image, sinogram and one row band")
+    return int(rows)
+
+
+def project_angles_tiled(work: np.ndarray, angles_deg: np.ndarray, sinogram: np.ndarray,
+                         cols, rows: int, fill: float = 0.0) -> None:
+    """
+    与 project_angles（method="rotate"）相同，但每个角度按输出行带旋转，
+    临时内存只与 rows × W 成正比。部分和存放在行带缓冲的第 0 行，与后续各行
+    依次相加，累加顺序与整幅 rot.sum(axis=0) 相同，结果逐位一致。
+    Same as project_angles with method="rotate", but each angle is rotated
+    in bands of `rows` output rows, so temporaries scale with rows × W.
+    The running column sum sits in row 0 of the band buffer and is added
+    row by row in the same order as the full rot.sum(axis=0), so the
+    result is bit-identical.
+    """
+    h, w = work.shape
+    buf_dtype = np.float32 if work.dtype == np.float32 else np.float64
+    rows = max(1, min(int(rows), h))
+    acc = np.empty((rows + 1, w), dtype=sinogram.dtype)
+    # 累加精度不同时先采样到 buf_dtype，再（精确地）转换 / sample in buf_dtype, then cast
+    band = None if acc.dtype == buf_dtype else np.empty((rows, w), dtype=buf_dtype)
+    scratch = np.empty((rows, w), dtype=buf_dtype)
+
+    for j in cols:
+        for r0 in range(0, h, rows):
+            n = min(rows, h - r0)
+            with profile_stage("rotate", angle=angles_deg[j], nbytes=n * w * scratch.itemsize):
+                xs, ys = inverse_rotation_coords(h, w, angles_deg[j], rows=(r0, r0 + n))
+                if band is None:
+                    sample_bilinear(work, xs, ys, fill=fill, out=acc[1:n + 1], scratch=scratch[:n])
+                else:
+                    sample_bilinear(work, xs, ys, fill=fill, out=band[:n], scratch=scratch[:n])
+                    acc[1:n + 1] = band[:n]
+                del xs, ys
+            with profile_stage("sum", angle=angles_deg[j]):
+                # 第一个行带从第 1 行起求和 / the first band starts at row 1
+                acc[0] = acc[(0 if r0 else 1):n + 1].sum(axis=0, dtype=acc.dtype)
+        sinogram[:, j] = acc[0]
 
 
 # ===========================================================
-# 6) 生成一个简易 "PL-star" 测试图（含弱噪声线）
-#    Build a toy PL-star image with optional faint noise rays
+# 8) 批量 Radon 变换（N 张图像共用旋转采样索引）
+#    Batched Radon transform sharing sampling indices across N images
 # ===========================================================
-def make_pl_star(shape=(1000, 1000),
-                 center=None,
-                 main_angles_deg=(0, 60, 120, 180, 240, 300),
-                 length=380,
-                 thickness=1,
-                 noise_angles_deg=(30, 90, 150, 210, 270, 330)) -> np.ndarray:
+def radon_transform_batch(stack: np.ndarray,
+                          angles_deg,
+                          use_circular_fov: bool = True,
+                          pad: bool = True,
+                          fill: float = 0.0,
+                          chunk: int = 8,
+                          geometry_cache=None,
+                          dtype=np.float64,
+                          geometry_bytes: int = 1 << 30):
     """
-    生成从中心点向若干角度发射的射线图案，可用于测试正弦图。
-    Generate a simple star-shaped pattern for testing the sinogram.
+    对 (N, H, W) 图像堆栈（可为 np.memmap）批量计算正弦图。
+    每个角度的 RotationGeometry 只构建一次并在所有批次之间共享，
+    gather 经 np.take(out=) 写入预分配缓冲，不产生 (B, S²) 临时数组。
+    Batched rotate-and-sum over an (N, H, W) stack (np.memmap is fine).
+    Each angle's RotationGeometry is built once and shared by every chunk;
+    the gathers write into preallocated buffers via np.take(out=), with no
+    (B, S²) temporaries.
 
     Parameters
     ----------
-    shape : tuple
-        图像尺寸 / image shape (H, W).
-    center : (cy, cx) or None
-        射线中心；None 则取图像中心。
-        Ray origin; defaults to image center if None.
-    main_angles_deg : iterable
-        主要射线角度（值较强） / main ray angles (strong).
-    length : int
-        射线长度（像素） / ray length in pixels.
-    thickness : int
-        线条"刷子"的半径（越大线越粗）。brush radius for thickness.
-    noise_angles_deg : iterable
-        噪声射线角度（值较弱） / faint noise ray angles.
+    stack : np.ndarray (N, H, W)
+        图像堆栈 / image stack.
+    angles_deg, use_circular_fov, pad, fill :
+        与 radon_transform_s_theta 相同 / same as radon_transform_s_theta.
+    chunk : int
+        每批同时处理的图像数；内存约为 chunk × S² × 3 个 dtype 缓冲。
+        Images processed together; memory ≈ chunk × S² × three dtype buffers.
+    geometry_cache : GeometryCache or None
+        给定时各角度几何从缓存获取（可跨调用复用）；否则按 geometry_bytes
+        分组构建，同组角度的几何同时驻留。
+        If given, per-angle geometry comes from the cache (and is reused
+        across calls); otherwise it is built in angle groups that fit in
+        `geometry_bytes`.
+    dtype : numpy dtype
+        工作精度与输出 dtype（float64 或 float32）。
+        Working precision and output dtype (float64 or float32).
+    geometry_bytes : int
+        未给定 geometry_cache 时同时驻留的几何字节上限（每角度约
+        (8 + 4·itemsize) B/像素）；角度超出时按组处理，每组重新读取堆栈。
+        Bytes of geometry held at once without a cache (about
+        (8 + 4·itemsize) B/pixel per angle); beyond that the angles are
+        processed in groups and the stack is re-read for each group.
+
+    Returns
+    -------
+    sinograms : np.ndarray (N, num_s, num_angles)
+        每张图的正弦图 / one (s, θ) sinogram per image.
+    s_coords : np.ndarray (num_s,)
+    angles_rad : np.ndarray (num_angles,)
     """
-    h, w = shape
-    img = np.zeros(shape, dtype=np.float64)
+    assert stack.ndim == 3, "stack must be 3D (N, H, W)"
+    n = stack.shape[0]
+    angles_deg = np.asarray(list(angles_deg), dtype=np.float64)
+    angles_rad = np.deg2rad(angles_deg)
+    dtype = np.dtype(dtype)
 
-    if center is None:
-        cy, cx = h // 2, w // 2
+    h0, w0 = stack.shape[1:]
+    if pad:
+        side = int(math.ceil(math.sqrt(h0 * h0 + w0 * w0)))
+        h, w = side, side
     else:
-        cy, cx = center
+        h, w = h0, w0
+    num_s = w
+    n_ang = len(angles_deg)
 
-    def draw_ray(angle_deg, val=1.0):
-        """在给定角度上画一条长度为 length 的射线（小方块刷实现厚度）。
-        Draw a ray using a small square brush to control thickness."""
-        theta = math.radians(angle_deg)
-        dx, dy = math.cos(theta), math.sin(theta)
-        for r in range(length):
-            x = int(round(cx + r * dx))
-            y = int(round(cy + r * dy))
-            if 0 <= x < w and 0 <= y < h:
-                # 用 (2*thickness+1)×(2*thickness+1) 的小方块加粗
-                img[max(0, y - thickness):min(h, y + thickness + 1),
-                    max(0, x - thickness):min(w, x + thickness + 1)] = val
-
-    # 画主射线（强信号）
-    for a in main_angles_deg:
-        draw_ray(a, val=1.0)
-
-    # 画弱噪声射线（弱信号）
-    for a in noise_angles_deg:
-        draw_ray(a, val=0.25)
+    sinograms = np.zeros((n, num_s, n_ang), dtype=dtype)
 
-    return img
+    # 有缓存时一组包含全部角度；否则按字节预算分组（索引 + 越界位置上限 + 4 个权重）
+    # One group of all angles with a cache; otherwise groups sized by the budget
+    if geometry_cache is not None:
+        group = max(n_ang, 1)
+    else:
+        group = max(1, int(geometry_bytes) // (h * w * (8 + 4 * dtype.itemsize)))
+
+    # 跨批次复用的缓冲：带 W+1 保护尾的工作图、采样输出与 gather 临时量
+    # Buffers reused across chunks: guarded work images, samples and gather scratch
+    b_max = min(chunk, n)
+    guarded = np.zeros((b_max, h * w + w + 1), dtype=dtype)
+    out = np.empty((b_max, h * w), dtype=dtype)
+    scratch = np.empty_like(out)
+
+    for a0 in range(0, n_ang, group):
+        angs = angles_deg[a0:a0 + group]
+        geos = None
+        if geometry_cache is None:
+            geos = [RotationGeometry(h, w, ang, dtype=dtype) for ang in angs]
+
+        for start in range(0, n, chunk):
+            stop = min(start + chunk, n)
+            b = stop - start
+            # 只读取当前块（对 memmap 友好） / only touch the current chunk
+            for k in range(start, stop):
+                guarded[k - start, :h * w] = prepare_work_image(
+                    stack[k], use_circular_fov=use_circular_fov, pad=pad,
+                    fill=fill, dtype=dtype).ravel()
+
+            for j, ang in enumerate(angs):
+                geo = geos[j] if geos is not None else geometry_cache.get(h, w, ang, dtype)
+                rot = geo.sample(guarded[:b], fill=fill, out=out[:b], scratch=scratch[:b])
+                sinograms[start:stop, :, a0 + j] = rot.reshape(b, h, w).sum(axis=1)
+
+    return sinograms, detector_coords(num_s), angles_rad
 
 
 # ===========================================================
-# 7) 脚本入口：构造示例、计算 Radon、可视化
-#    Script entry: build example, compute Radon, visualize
+# 9) 流式正弦图：逐块产出投影，可直接写入 memmap / .npy
+#    Streaming sinogram: yield projections chunk by chunk, optionally into a memmap
 # ===========================================================
-if __name__ == "__main__":
-    # (1) 构造一个测试图像（中心偏移以验证非中心情况）
-    #     Build a test image; center is slightly off to show generality
-    test = make_pl_star(shape=(1000, 1000), center=(800, 470), length=380, thickness=1)
+def iter_radon_s_theta(img: np.ndarray,
+                       angles_deg,
+                       use_circular_fov: bool = True,
+                       pad: bool = True,
+                       fill: float = 0.0,
+                       method: str = "rotate",
+                       chunk: int = 1,
+                       dtype=np.float64,
+                       geometry_cache=None,
+                       out=None,
+                       accum_dtype=None,
+                       workers=None,
+                       executor: str = "thread",
+                       symmetry: bool = False):
+    """
+    生成器版本的 radon_transform_s_theta：每算完 chunk 个角度就产出一次，
+    内存中只保留当前块；下游（如峰值检测）可在变换结束前开始处理。
+    Generator variant of radon_transform_s_theta: yields every `chunk`
+    angles as soon as they are computed, holding only the current block.
 
-    # (2) 角度范围：0..179 度（常见选择；可按需加密/稀疏）
-    #     Angles from 0 to 179 degrees (common choice)
-    angles_deg = np.arange(0, 180, 1, dtype=np.float64)
+    Parameters
+    ----------
+    img, angles_deg, use_circular_fov, pad, fill, method, dtype, geometry_cache,
+    accum_dtype, workers, executor :
+        与 radon_transform_s_theta 相同 / same as radon_transform_s_theta.
+    chunk : int
+        每次产出的角度数。"fourier" 每块都要重做 2-D FFT，宜取较大的块。
+        Angles per yielded block; "fourier" redoes its 2-D FFT per block,
+        so prefer large chunks there.
+    out : np.ndarray (num_s, num_angles) or None
+        若给定（如 np.memmap / open_memmap），每块同时写入 out[:, cols]。
+        If given (e.g. an np.memmap), each block is also written into it.
+    symmetry : bool
+        仅支持 False：流式输出按请求顺序逐块计算每个角度，不做半圈
+        （θ 与 θ+180°）折叠；需要折叠时请用 radon_transform_s_theta。
+        Only False is supported: streaming computes every requested angle
+        block by block and does not fold half-turn (θ, θ+180°) pairs; use
+        radon_transform_s_theta for that.
 
-    # (3) 计算 Radon（直接得到 (s, θ) 排布）
-    #     Compute Radon; output is already arranged as (s, θ)
-    sino, s, ang_rad = radon_transform_s_theta(
-        test, angles_deg, use_circular_fov=True, pad=True, fill=0.0
-    )
+    Yields
+    ------
+    angles : np.ndarray (k,)
+        本块的角度（度） / angles of this block in degrees.
+    projections : np.ndarray (num_s, k)
+        本块的投影（列与 angles 对应） / projections, one column per angle.
+    """
+    assert img.ndim == 2, "img must be 2D"
+    if symmetry:
+        raise ValueError("streaming does not fold half-turn angles; use symmetry=False "
+                         "or radon_transform_s_theta")
+    accum_dtype = np.dtype(dtype if accum_dtype is None else accum_dtype)
+    work = prepare_work_image(img, use_circular_fov=use_circular_fov, pad=pad,
+                              fill=fill, dtype=dtype)
+    num_s = work.shape[1]
+    angles_deg = np.asarray(list(angles_deg), dtype=np.float64)
+    if out is not None:
+        assert out.shape == (num_s, len(angles_deg)), "out has the wrong shape"
+
+    for start in range(0, len(angles_deg), chunk):
+        stop = min(start + chunk, len(angles_deg))
+        block = np.zeros((num_s, stop - start), dtype=accum_dtype)
+        project_work(work, angles_deg[start:stop], block, img.shape, method=method,
+                     use_circular_fov=use_circular_fov, pad=pad, fill=fill,
+                     workers=workers, executor=executor,
+                     geometry_cache=geometry_cache)
+        if out is not None:
+            out[:, start:stop] = block
+        yield angles_deg[start:stop], block
+
+
+def radon_to_npy(img: np.ndarray, angles_deg, path: str, chunk: int = 8,
+                 dtype=np.float64, **kwargs):
+    """
+    将正弦图以流式方式直接写入 .npy 文件（np.lib.format.open_memmap），
+    结果从不完整驻留内存。
+    Stream the sinogram straight into a .npy file via open_memmap, so the
+    full result never has to sit in RAM.
+
+    其余关键字参数传给 iter_radon_s_theta（不支持的参数直接报 TypeError）；
+    文件 dtype 为 accum_dtype（默认同 dtype）。流式输出逐个计算请求的角度，
+    不做半圈折叠，symmetry=True 会报 ValueError。
+    Other keyword arguments go to iter_radon_s_theta (unknown ones raise
+    TypeError); the file dtype is accum_dtype (default `dtype`). Streaming
+    computes every requested angle and does not fold half-turn angles, so
+    symmetry=True raises ValueError.
+
+    Returns
+    -------
+    sinogram : np.memmap (num_s, num_angles)
+        已写入并 flush 的内存映射 / the flushed memory map.
+    s_coords : np.ndarray (num_s,)
+    angles_rad : np.ndarray (num_angles,)
+    """
+    angles_deg = np.asarray(list(angles_deg), dtype=np.float64)
+    h, w = img.shape
+    num_s = int(math.ceil(math.sqrt(h * h + w * w))) if kwargs.get("pad", True) else w
+
+    if kwargs.get("symmetry"):
+        raise ValueError("streaming does not fold half-turn angles; use symmetry=False "
+                         "or radon_transform_s_theta")
+    accum_dtype = dtype if kwargs.get("accum_dtype") is None else kwargs["accum_dtype"]
+    sinogram = np.lib.format.open_memmap(path, mode="w+", dtype=accum_dtype,
+                                         shape=(num_s, len(angles_deg)))
+    for _ in iter_radon_s_theta(img, angles_deg, chunk=chunk, dtype=dtype,
+                                out=sinogram, **kwargs):
+        pass
+    sinogram.flush()
+    return sinogram, detector_coords(num_s), np.deg2rad(angles_deg)
+
+
+# ===========================================================
+# 10) 增量更新：局部编辑只重算受影响的探测器单元（线性叠加）
+#     Incremental update: re-project only the edited patch (linearity)
+# ===========================================================
+def image_delta(old: np.ndarray, new: np.ndarray, bbox=None):
+    """
+    两张图的差分补丁。bbox=(y0, y1, x0, x1) 给定时只取该区域；
+    否则返回整幅差分（update_sinogram 会自动裁到非零范围）。
+    Difference patch between two images; restricted to bbox=(y0, y1, x0, x1)
+    when given, otherwise the full difference (update_sinogram crops it to
+    its nonzero extent).
+
+    Returns
+    -------
+    delta : np.ndarray
+    origin : (int, int)
+        补丁左上角在原图中的 (y, x) / top-left (y, x) of the patch.
+    """
+    if bbox is None:
+        return np.asarray(new, dtype=np.float64) - old, (0, 0)
+    y0, y1, x0, x1 = bbox
+    return np.asarray(new[y0:y1, x0:x1], dtype=np.float64) - old[y0:y1, x0:x1], (y0, x0)
+
+
+def update_sinogram(sinogram: np.ndarray, angles_deg, image_shape, delta: np.ndarray,
+                    origin=(0, 0), use_circular_fov: bool = True, pad: bool = True,
+                    symmetry: bool = True, out=None) -> np.ndarray:
+    """
+    利用线性：R(img + Δ) = R(img) + R(Δ)。对每个角度只在 Δ 补丁（外扩 1 像素
+    的双线性足迹）旋转后覆盖的输出窗口内采样，代价 ∝ 补丁面积 × 角度数。
+    pad 区域与越界填充不随编辑变化，因此对任意 fill 都成立。
+    By linearity R(img + Δ) = R(img) + R(Δ). Per angle only the output
+    window covered by the rotated Δ patch (plus its 1-pixel bilinear
+    footprint) is sampled, so the cost is O(patch area × angles). Padding
+    and out-of-bounds fill do not change with the edit, so any fill works.
+
+    Parameters
+    ----------
+    sinogram : np.ndarray (num_s, num_angles)
+        先前由 radon_transform_s_theta（"rotate"/"ray"）得到的正弦图。
+        Previous sinogram from radon_transform_s_theta ("rotate"/"ray").
+    angles_deg, image_shape, use_circular_fov, pad, symmetry :
+        与计算 sinogram 时相同 / as used for `sinogram`.
+    delta : np.ndarray
+        新图减旧图的补丁（见 image_delta） / new − old patch (see image_delta).
+    origin : (int, int)
+        补丁左上角在原图中的 (y, x) / top-left (y, x) of the patch.
+    out : np.ndarray or None
+        输出；传入 sinogram 本身即原地更新 / pass `sinogram` to update in place.
+
+    Returns
+    -------
+    sinogram : np.ndarray (num_s, num_angles)
+        与整幅重算一致（至浮点舍入） / equal to a full recompute up to rounding.
+    """
+    if out is None:
+        out = np.array(sinogram, copy=True)
+    elif out is not sinogram:
+        out[...] = sinogram
+
+    h, w = image_shape
+    if pad:
+        side = int(math.ceil(math.sqrt(h * h + w * w)))
+        H = W = side
+        oy, ox = (side - h) // 2, (side - w) // 2
+    else:
+        H, W, oy, ox = h, w, 0, 0
+
+    delta = np.asarray(delta, dtype=np.float64)
+    rows = np.flatnonzero(delta.any(axis=1))
+    cols = np.flatnonzero(delta.any(axis=0))
+    if len(rows) == 0:
+        return out
+    delta = delta[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+    ph, pw = delta.shape
+    py0, px0 = origin[0] + oy + rows[0], origin[1] + ox + cols[0]   # 工作图坐标 / work frame
+    if use_circular_fov:
+        delta = delta * fov_mask(H, W)[py0:py0 + ph, px0:px0 + pw]
+
+    # 外围补一圈 0，使补丁外的双线性角点取到 0 / zero ring for the bilinear footprint
+    patch = np.zeros((ph + 2, pw + 2), dtype=np.float64)
+    patch[1:-1, 1:-1] = delta
+    flat = patch.ravel()
+    by0, bx0 = py0 - 1, px0 - 1
+    cy, cx = (H - 1) / 2.0, (W - 1) / 2.0
+    corner_x = np.array([bx0, bx0 + pw + 1, bx0, bx0 + pw + 1]) - cx
+    corner_y = np.array([by0, by0, by0 + ph + 1, by0 + ph + 1]) - cy
+
+    for j, ang in enumerate(np.asarray(list(angles_deg), dtype=np.float64)):
+        wrapped = float(np.round(np.mod(ang, 360.0), 9) % 360.0)
+        # 与 fold_half_turn 一致：θ ≥ 180° 由 θ − 180° 沿 s 翻转得到
+        # mirror fold_half_turn: θ ≥ 180° is the s-flip of θ − 180°
+        flip = symmetry and wrapped >= 180.0
+        if symmetry:
+            ang = wrapped - 180.0 * flip
+        if symmetry and H == W and wrapped % 90.0 == 0.0:
+            # 与折叠路径一致：轴对齐角度为精确行/列求和 / exact sums, as in the folded path
+            q = int(wrapped // 90.0)
+            if q == 0:
+                out[px0:px0 + pw, j] += delta.sum(axis=0)
+            elif q == 1:
+                out[W - py0 - ph:W - py0, j] += delta.sum(axis=1)[::-1]
+            elif q == 2:
+                out[W - px0 - pw:W - px0, j] += delta.sum(axis=0)[::-1]
+            else:
+                out[py0:py0 + ph, j] += delta.sum(axis=1)
+            continue
+
+        theta = math.radians(ang)
+        cos_t, sin_t = math.cos(theta), math.sin(theta)
+        # 补丁四角正向旋转后的输出窗口 / output window of the forward-rotated corners
+        xo = cos_t * corner_x - sin_t * corner_y + cx
+        yo = sin_t * corner_x + cos_t * corner_y + cy
+        x_lo, x_hi = max(0, int(np.floor(xo.min())) - 1), min(W - 1, int(np.ceil(xo.max())) + 1)
+        y_lo, y_hi = max(0, int(np.floor(yo.min())) - 1), min(H - 1, int(np.ceil(yo.max())) + 1)
+        if x_lo > x_hi or y_lo > y_hi:
+            continue
+
+        # 与 inverse_rotation_coords 相同的逆映射 / same inverse mapping
+        x_rel = np.arange(x_lo, x_hi + 1)[None, :] - cx
+        y_rel = np.arange(y_lo, y_hi + 1)[:, None] - cy
+        xs = cos_t * x_rel + sin_t * y_rel + cx
+        ys = -sin_t * x_rel + cos_t * y_rel + cy
+
+        idx, wts, outside = bilinear_taps(ph + 2, pw + 2, xs - bx0, ys - by0)
+        vals = (flat[idx] * wts).sum(axis=0)
+        vals[outside | (xs < 0) | (xs > W - 1) | (ys < 0) | (ys > H - 1)] = 0.0
+        if flip:
+            out[W - 1 - x_hi:W - x_lo, j] += vals.sum(axis=0)[::-1]
+        else:
+            out[x_lo:x_hi + 1, j] += vals.sum(axis=0)
+    return out
+
+
+# ===========================================================
+# 11) 正弦图结果缓存（内容哈希 + 参数为键，内存 + 磁盘 LRU）
+#     Sinogram result cache keyed by content hash + parameters
+# ===========================================================
+class SinogramCache:
+    """
+    包装 radon_transform_s_theta 的结果缓存：键为输入数组内容（blake2b）
+    与影响结果的参数（角度、pad、FOV、fill、method、dtype…）。
+    内存层与磁盘层各自按字节数 LRU 淘汰；线程安全。
+    Result cache around radon_transform_s_theta, keyed by a blake2b hash of
+    the input array plus every parameter that affects the output. Memory and
+    disk tiers are each byte-bounded LRU. Thread-safe.
+
+    Parameters
+    ----------
+    max_bytes : int
+        内存层容量 / memory tier capacity in bytes.
+    cache_dir : str or None
+        磁盘层目录；None 表示只用内存。
+        Disk tier directory; None keeps results in memory only.
+    max_disk_bytes : int
+        磁盘层容量（按文件修改时间淘汰最旧者）/ disk tier capacity; the
+        least recently used files (by mtime) are removed first.
+    compress : bool
+        True 存为压缩 .npz（体积小、读取需解压）；False 存为 .npy，
+        每次命中都以只读 memmap 重新打开（几乎瞬时），不放入内存层，
+        以免占用文件描述符、绕过容量上限。
+        Store compressed .npz (smaller, decompressed on read) or .npy,
+        reopened as a read-only memmap on every hit (near-instant) and kept
+        out of the memory tier, so memmaps neither hold file descriptors
+        nor escape its byte bound.
+
+    Notes
+    -----
+    返回的正弦图是只读的（内存层共享同一数组）；需要修改时请先 copy()。
+    Returned sinograms are read-only (the memory tier shares one array);
+    copy() before modifying them.
+    """
+
+    # 不影响结果的参数不参与键（max_bytes 分块结果逐位一致）
+    # parameters that do not change the result (tiling is bit-identical)
+    _IGNORED = ("workers", "executor", "geometry_cache", "max_bytes")
+
+    def __init__(self, max_bytes: int = 512 << 20, cache_dir=None,
+                 max_disk_bytes: int = 4 << 30, compress: bool = False):
+        from collections import OrderedDict
+
+        self.max_bytes = int(max_bytes)
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = int(max_disk_bytes)
+        self.compress = compress
+        self.nbytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, img: np.ndarray, angles_deg, **kwargs) -> str:
+        """输入内容与参数的哈希 / hash of the input content and parameters."""
+        import inspect
+
+        img = np.ascontiguousarray(img)
+        # 补全默认值，省略参数与显式传默认值得到同一键
+        # bind defaults so omitted and explicitly-default arguments share a key
+        bound = inspect.signature(radon_transform_s_theta).bind(img, angles_deg, **kwargs)
+        bound.apply_defaults()
+        params = {k: v for k, v in bound.arguments.items()
+                  if k not in self._IGNORED + ("img", "angles_deg")}
+        for k in ("dtype", "accum_dtype"):
+            if params.get(k) is not None:
+                params[k] = np.dtype(params[k]).str
+        h = hashlib.blake2b(digest_size=20)
+        h.update(repr((img.shape, img.dtype.str, sorted(params.items()))).encode("utf-8"))
+        h.update(np.asarray(list(angles_deg), dtype=np.float64).tobytes())
+        h.update(memoryview(img).cast("B"))
+        return h.hexdigest()
+
+    def radon(self, img: np.ndarray, angles_deg, **kwargs):
+        """
+        与 radon_transform_s_theta 相同的调用与返回值，命中时直接取缓存。
+        Same call and return value as radon_transform_s_theta, served from
+        the cache on a hit.
+        """
+        angles_deg = np.asarray(list(angles_deg), dtype=np.float64)
+        key = self.key(img, angles_deg, **kwargs)
+
+        sino = self._lookup(key)
+        if sino is None:
+            sino, _, _ = radon_transform_s_theta(img, angles_deg, **kwargs)
+            sino.flags.writeable = False
+            self._store(key, sino)
+        return sino, detector_coords(sino.shape[0]), np.deg2rad(angles_deg)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, "sinogram_" + key
+                            + (".npz" if self.compress else ".npy"))
+
+    def _lookup(self, key: str):
+        with self._lock:
+            sino = self._entries.get(key)
+            if sino is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return sino
+
+        if self.cache_dir is not None:
+            path = self._path(key)
+            try:
+                if self.compress:
+                    with np.load(path) as data:
+                        sino = data["sinogram"]
+                    sino.flags.writeable = False
+                else:
+                    sino = np.load(path, mmap_mode="r")
+                os.utime(path)
+            except (OSError, ValueError, KeyError):
+                sino = None
+            if sino is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                if not isinstance(sino, np.memmap):
+                    self._remember(key, sino)
+                return sino
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _remember(self, key: str, sino: np.ndarray) -> None:
+        nbytes = sino.nbytes
+        with self._lock:
+            if key in self._entries or nbytes > self.max_bytes:
+                return
+            self._entries[key] = sino
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, old = self._entries.popitem(last=False)
+                self.nbytes -= old.nbytes
+
+    def _store(self, key: str, sino: np.ndarray) -> None:
+        self._remember(key, sino)
+        if self.cache_dir is None:
+            return
+        import tempfile
+
+        # 每个写入者用唯一临时文件，多进程共享 cache_dir 时互不干扰
+        # unique temp file per writer, safe when processes share cache_dir
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=".sinogram_", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if self.compress:
+                    np.savez_compressed(f, sinogram=sino)
+                else:
+                    np.save(f, sino)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp)
+            raise
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if name.startswith("sinogram_") and name.endswith((".npy", ".npz")):
+                # 其他进程可能已淘汰该文件 / another process may have evicted it
+                try:
+                    st = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+    def clear(self, disk: bool = False) -> None:
+        """清空内存层（disk=True 时同时删除磁盘文件）/ clear memory (and disk)."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+        if disk and self.cache_dir is not None:
+            self.max_disk_bytes, saved = 0, self.max_disk_bytes
+            self._evict_disk()
+            self.max_disk_bytes = saved
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# ===========================================================
+# 12) 多核并行：按角度切分到线程池 / 进程池
+#    Multi-core engine: split the angle set over a thread/process pool
+# ===========================================================
+def run_angle_parallel(work: np.ndarray, angles_deg: np.ndarray, sinogram: np.ndarray,
+                       fill: float = 0.0, workers: int = -1,
+                       executor: str = "thread", geometry_cache=None,
+                       method: str = "rotate") -> None:
+    """
+    将角度集合切分为 workers 份并行计算，结果写回 sinogram 的对应列。
+    Split the angles into `workers` groups and fill the sinogram columns
+    in parallel.
+
+    - "thread"：各线程共享 work/sinogram（及 geometry_cache），直接写入各自的列。
+      Threads share work/sinogram (and geometry_cache) and write their own
+      columns.
+    - "process"：work 与 sinogram 放在 multiprocessing.shared_memory 中，
+      子进程原地写入，避免序列化大数组。
+      Work image and sinogram live in shared memory; child processes write
+      in place, so no large array is pickled. geometry_cache is not used.
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    n_ang = len(angles_deg)
+    groups = [g for g in np.array_split(np.arange(n_ang), min(workers, n_ang)) if len(g)]
+
+    if executor == "thread":
+        with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+            futures = [pool.submit(project_angles, work, angles_deg, sinogram, g,
+                                   fill, geometry_cache, method)
+                       for g in groups]
+            for f in futures:
+                f.result()
+        return
+
+    if executor != "process":
+        raise ValueError(f"unknown executor: {executor!r}")
+
+    from multiprocessing import shared_memory
+
+    work = np.ascontiguousarray(work)
+    shm_in = shared_memory.SharedMemory(create=True, size=max(work.nbytes, 1))
+    shm_out = shared_memory.SharedMemory(create=True, size=max(sinogram.nbytes, 1))
+    try:
+        np.ndarray(work.shape, dtype=work.dtype, buffer=shm_in.buf)[:] = work
+        out = np.ndarray(sinogram.shape, dtype=sinogram.dtype, buffer=shm_out.buf)
+        out[:] = 0.0
+
+        with ProcessPoolExecutor(max_workers=len(groups)) as pool:
+            futures = [pool.submit(_shared_memory_angle_worker,
+                                   shm_in.name, shm_out.name,
+                                   (work.shape, work.dtype.str),
+                                   (sinogram.shape, sinogram.dtype.str),
+                                   angles_deg, g, fill, method)
+                       for g in groups]
+            for f in futures:
+                f.result()
+
+        sinogram[:] = out
+        del out
+    finally:
+        shm_in.close()
+        shm_in.unlink()
+        shm_out.close()
+        shm_out.unlink()
+
+
+def _shared_memory_angle_worker(in_name, out_name, work_spec, sino_spec,
+                                angles_deg, cols, fill, method="rotate"):
+    """子进程入口：挂载共享内存并写入指定列 / child entry on shared memory."""
+    from multiprocessing import shared_memory
+
+    shm_in = shared_memory.SharedMemory(name=in_name)
+    shm_out = shared_memory.SharedMemory(name=out_name)
+    try:
+        work = np.ndarray(work_spec[0], dtype=np.dtype(work_spec[1]), buffer=shm_in.buf)
+        sino = np.ndarray(sino_spec[0], dtype=np.dtype(sino_spec[1]), buffer=shm_out.buf)
+        project_angles(work, angles_deg, sino, cols, fill=fill, method=method)
+        del work, sino
+    finally:
+        shm_in.close()
+        shm_out.close()
+
+
+# ===========================================================
+# 13) 傅里叶切片（FFT）Radon 变换
+#    Fourier-slice (FFT-based) Radon transform
+# ===========================================================
+def fourier_slice_projections(work: np.ndarray, angles_deg, oversample: float = 2.0) -> np.ndarray:
+    """
+    基于投影切片定理计算投影：对零填充（过采样）的工作图做 2-D FFT，
+    沿每个角度的径向直线做双线性（复数）插值，再对每个角度做 1-D 逆 FFT。
+    Projection-slice theorem: 2-D FFT of the zero-padded work image, bilinear
+    (complex) polar resampling along each angle, then a 1-D inverse FFT.
+
+    几何与 rotate_image_bilinear 一致：s = x·cosθ − y·sinθ（相对中心，y 向下）。
+    Same geometry as the rotate path: s = x·cosθ − y·sinθ about the center.
+
+    Parameters
+    ----------
+    work : np.ndarray (H, W)
+        已 pad / 裁切 FOV 的工作图 / prepared work image.
+    angles_deg : array of float
+        投影角度（度） / projection angles in degrees.
+    oversample : float
+        频域过采样倍数（零填充），越大插值越准，FFT 越慢。
+        Zero-padding factor in the frequency domain.
+
+    Returns
+    -------
+    sinogram : np.ndarray (W, num_angles)
+
+    Notes
+    -----
+    - 复杂度 O(M² log M + Nθ · M log M)，M ≈ oversample × max(H, W)。
+      1000×1000、180 个角度约快 40 倍。
+      Complexity O(M² log M + Nθ·M log M); ~40× faster at 1000² / 180 angles.
+    - 与双线性"旋转 + 列求和"相比（compare_radon_methods），相对 L2 差异：
+      平滑图像约 1%，细线 PL-star 图约 2~7%，白噪声约 3~5%；差异集中在尖峰
+      处（双线性旋转本身有低通效果）。
+      Relative L2 difference versus the bilinear rotate path: ~1% on smooth
+      maps, ~2–7% on thin-line PL-star maps, ~3–5% on white noise; it is
+      concentrated at sharp peaks, where bilinear rotation itself acts as a
+      low-pass filter.
+    """
+    h, w = work.shape
+    cy, cx = (h - 1) / 2.0, (w - 1) / 2.0
+    m = 2 * int(math.ceil(oversample * max(h, w) / 2.0))
+    freqs = np.fft.fftfreq(m)
+
+    # 2-D 频谱：输入乘 (−1)^(y+x) 使零频直接落在网格中央（m 为偶数，等价于
+    # fftshift，但不复制频谱），再按行、列可分离相位原地移到图像几何中心
+    # 2-D spectrum: multiplying the input by (−1)^(y+x) puts DC in the middle
+    # of the grid (fftshift for even m, without copying the spectrum); the
+    # centring phase is then applied in place as separable row/column factors
+    signed = np.array(work, dtype=np.float64)
+    signed[1::2, ::2] *= -1.0
+    signed[::2, 1::2] *= -1.0
+    spec = np.fft.fft2(signed, s=(m, m))
+    del signed
+    shifted = np.fft.fftshift(freqs)
+    spec *= np.exp(2j * np.pi * shifted * cy)[:, None]
+    spec *= np.exp(2j * np.pi * shifted * cx)[None, :]
+
+    # 每个角度的径向切片：(kx, ky) = (ω cosθ, −ω sinθ)
+    # Radial slice per angle: (kx, ky) = (ω cosθ, −ω sinθ)
+    theta = np.deg2rad(np.asarray(angles_deg, dtype=np.float64))
+    kx = np.cos(theta)[:, None] * freqs[None, :]
+    ky = -np.sin(theta)[:, None] * freqs[None, :]
+    idx, wts, outside = bilinear_taps(m, m, kx * m + m // 2, ky * m + m // 2)
+
+    flat = spec.ravel()
+    slices = (flat[idx[0]] * wts[0] + flat[idx[1]] * wts[1]
+              + flat[idx[2]] * wts[2] + flat[idx[3]] * wts[3])
+    slices[outside] = 0.0
+
+    # 平移回探测器索引原点（s = 0 对应第 cx 个探测器）后 1-D 逆 FFT
+    # Shift the origin back to detector index cx, then 1-D inverse FFT
+    slices *= np.exp(-2j * np.pi * freqs[None, :] * cx)
+    proj = np.fft.ifft(slices, axis=1).real[:, :w]          # (num_angles, W)
+    return np.ascontiguousarray(proj.T)
+
+
+def linear_interval(a, b, lo, hi, tol: float = 0.0):
+    """
+    逐元素求满足 lo ≤ a·y + b ≤ hi 的 y 区间（a≈0 时为全体或空集，
+    此时按 tol 放宽对 b 的判断）。
+    Element-wise y-range solving lo ≤ a·y + b ≤ hi (all or nothing if a≈0,
+    judged on b with tolerance tol).
+
+    Returns
+    -------
+    y_lo, y_hi : np.ndarray
+        区间端点；空集时 y_lo > y_hi / interval ends, y_lo > y_hi if empty.
+    """
+    b = np.asarray(b, dtype=np.float64)
+    a = np.broadcast_to(a, b.shape)
+    flat = np.abs(a) < 1e-9
+    safe = np.where(flat, 1.0, a)
+    y_a, y_b = (lo - b) / safe, (hi - b) / safe
+    y_lo, y_hi = np.minimum(y_a, y_b), np.maximum(y_a, y_b)
+    ok = (b >= lo - tol) & (b <= hi + tol)
+    y_lo = np.where(flat, np.where(ok, -np.inf, np.inf), y_lo)
+    y_hi = np.where(flat, np.where(ok, np.inf, -np.inf), y_hi)
+    return y_lo, y_hi
+
+
+def oob_sample_counts(h: int, w: int, angles_deg) -> np.ndarray:
+    """
+    解析计算"旋转 + 列求和"中每个 (s, θ) 的越界采样数（不做逐像素旋转），
+    用于非旋转实现中复现 fill ≠ 0 时的常数项。
+    Analytic count of out-of-bound samples per (s, θ) of the rotate path,
+    used to reproduce the fill term without rotating the image.
+
+    Returns
+    -------
+    counts : np.ndarray (W, num_angles) float64
+    """
+    cy, cx = (h - 1) / 2.0, (w - 1) / 2.0
+    theta = np.deg2rad(np.asarray(angles_deg, dtype=np.float64))
+    cos_t, sin_t = np.cos(theta)[None, :], np.sin(theta)[None, :]
+    x_rel = (np.arange(w) - cx)[:, None]                    # (W, 1)
+
+    # xs = sinθ·y_rel + (cosθ·x_rel + cx) ∈ [0, W−1]
+    # ys = cosθ·y_rel + (−sinθ·x_rel + cy) ∈ [0, H−1]
+    lo1, hi1 = linear_interval(sin_t, cos_t * x_rel + cx, 0.0, w - 1.0)
+    lo2, hi2 = linear_interval(cos_t, -sin_t * x_rel + cy, 0.0, h - 1.0)
+    y_lo = np.maximum(np.maximum(lo1, lo2) + cy, 0.0)
+    y_hi = np.minimum(np.minimum(hi1, hi2) + cy, h - 1.0)
+
+    inside = np.floor(y_hi) - np.ceil(y_lo) + 1.0
+    inside = np.where(y_hi >= y_lo, np.clip(inside, 0.0, h), 0.0)
+    return h - inside
+
+
+def compare_radon_methods(img: np.ndarray, angles_deg, methods=("fourier",),
+                          reference: str = "rotate", **kwargs) -> dict:
+    """
+    以 reference 方法为基准，比较各方法的精度与耗时。
+    Accuracy/timing comparison of `methods` against the `reference` method.
+
+    Returns
+    -------
+    report : dict
+        {method: {"seconds", "rel_l2", "max_abs", "max_rel"}}，
+        max_rel 为最大绝对误差除以基准的最大绝对值。
+        max_rel is the max abs error divided by the reference's max abs value.
+    """
+    t0 = time.perf_counter()
+    ref, _, _ = radon_transform_s_theta(img, angles_deg, method=reference, **kwargs)
+    report = {reference: {"seconds": time.perf_counter() - t0,
+                          "rel_l2": 0.0, "max_abs": 0.0, "max_rel": 0.0}}
+    ref_norm = np.linalg.norm(ref) or 1.0
+    ref_peak = np.abs(ref).max() or 1.0
+
+    for name in methods:
+        t0 = time.perf_counter()
+        sino, _, _ = radon_transform_s_theta(img, angles_deg, method=name, **kwargs)
+        elapsed = time.perf_counter() - t0
+        err = np.abs(sino - ref)
+        report[name] = {"seconds": elapsed,
+                        "rel_l2": float(np.linalg.norm(sino - ref) / ref_norm),
+                        "max_abs": float(err.max()),
+                        "max_rel": float(err.max() / ref_peak)}
+    return report
+
+
+# ===========================================================
+# 14) 射线驱动投影：只沿穿过支撑区域（FOV 圆盘）的射线积分
+#    Ray-driven projector: integrate only where rays cross the support
+# ===========================================================
+def work_support_rect(image_shape, work_shape, pad: bool, fill: float = 0.0):
+    """
+    工作图中可能非零的矩形 (y0, y1, x0, x1)：pad 且 fill=0 时为原图区域，否则为 None。
+    Inclusive non-zero rectangle of the work image: the unpadded map when
+    padding with zeros, else None.
+    """
+    if not pad or fill != 0.0:
+        return None
+    h0, w0 = image_shape
+    h, w = work_shape
+    # pad 区域全为零，射线只需覆盖原图矩形 / padding is zero
+    top, left = (h - h0) // 2, (w - w0) // 2
+    return (top, top + h0 - 1, left, left + w0 - 1)
+
+
+def ray_projections(work: np.ndarray,
+                    angles_deg,
+                    fill: float = 0.0,
+                    use_circular_fov: bool = True,
+                    support_rect=None,
+                    s_index=None) -> np.ndarray:
+    """
+    Joseph 式射线驱动投影：每条探测器射线只在与支撑区域相交的弦上按单位
+    步长采样（双线性），同一角度的所有射线一次性向量化计算，不再旋转整幅图。
+    Joseph-style ray-driven projector: each detector ray is sampled (bilinear,
+    unit step) only on its chord through the support; all rays of an angle
+    are evaluated at once and no full rotated image is allocated.
+
+    采样位置与 rotate_image_bilinear 完全相同（仅跳过必然为零的采样），
+    因此结果与"旋转 + 列求和"一致（仅求和顺序不同）。fill ≠ 0 时圆盘外、
+    边界内的采样仍需判断越界，故只裁切到图像边界。
+    Sample positions are exactly those of the rotate path minus samples that
+    are provably zero, so results agree up to summation order. With fill ≠ 0
+    rays are only clipped to the image bounds, since every in-bound sample
+    must be told apart from an out-of-bound one.
+
+    Parameters
+    ----------
+    work : np.ndarray (H, W)
+        已 pad / 裁切 FOV 的工作图 / prepared work image.
+    angles_deg : array of float
+    fill : float
+        越界采样的填充值 / fill value for out-of-bound samples.
+    use_circular_fov : bool
+        True 时射线裁切到内切圆（外扩 1.5 像素以覆盖双线性邻域）。
+        Clip rays to the inscribed disk (+1.5 px for the bilinear footprint).
+    support_rect : (y0, y1, x0, x1) or None
+        工作图中可能非零的矩形（闭区间），如 pad 前原图所在区域。
+        Inclusive rectangle holding all non-zero pixels (e.g. the unpadded map).
+    s_index : array of int or None
+        只计算这些探测器（列索引）；None 为全部。射线相互独立，
+        代价只与所选探测器数成正比。
+        Compute only these detector bins; None means all. Rays are
+        independent, so the cost scales with the number of bins.
+
+    Returns
+    -------
+    sinogram : np.ndarray (W, num_angles) or (len(s_index), num_angles)
+    """
+    h, w = work.shape
+    cy, cx = (h - 1) / 2.0, (w - 1) / 2.0
+    angles_deg = np.asarray(angles_deg, dtype=np.float64)
+    flat = work.ravel()
+    det = np.arange(w) if s_index is None else np.asarray(s_index, dtype=np.int64)
+    n_det = len(det)
+    t = det - cx                                             # 每条射线的 s / ray offsets
+    eps = 1e-9
+    restrict = fill == 0.0                                   # 可跳过必为零的采样 / zero samples skippable
+    sinogram = np.zeros((n_det, len(angles_deg)), dtype=np.float64)
+
+    # 圆盘弦：u² ≤ R² − t² / chord through the (enlarged) FOV disk
+    if use_circular_fov:
+        radius = min(cx, cy) + 1.5
+        half = np.sqrt(np.clip(radius * radius - t * t, 0.0, None))
+        disk_lo = np.where(np.abs(t) <= radius, -half, np.inf)
+        disk_hi = np.where(np.abs(t) <= radius, half, -np.inf)
+
+    for j, ang in enumerate(angles_deg):
+        theta = math.radians(ang)
+        cos_t, sin_t = math.cos(theta), math.sin(theta)
+
+        # 采样点 (xs, ys) = (cosθ·t + sinθ·u + cx, −sinθ·t + cosθ·u + cy)
+        # 先裁切到图像边界（外扩 1 个采样，边界处由逐采样判断决定），
+        # 再裁切到支撑矩形与圆盘
+        # Clip u to the image bounds (+1 sample; the per-sample test decides
+        # at the border), then to the support rectangle and disk
+        lo1, hi1 = linear_interval(sin_t, cos_t * t + cx, 0.0, w - 1.0, tol=1e-6)
+        lo2, hi2 = linear_interval(cos_t, -sin_t * t + cy, 0.0, h - 1.0, tol=1e-6)
+        u_lo, u_hi = np.maximum(lo1, lo2) - 1.0, np.minimum(hi1, hi2) + 1.0
+        if restrict and support_rect is not None:
+            y0, y1, x0, x1 = support_rect
+            lo3, hi3 = linear_interval(sin_t, cos_t * t + cx, x0 - 1.0, x1 + 1.0, tol=1e-6)
+            lo4, hi4 = linear_interval(cos_t, -sin_t * t + cy, y0 - 1.0, y1 + 1.0, tol=1e-6)
+            u_lo = np.maximum(u_lo, np.maximum(lo3, lo4))
+            u_hi = np.minimum(u_hi, np.minimum(hi3, hi4))
+        if restrict and use_circular_fov:
+            u_lo, u_hi = np.maximum(u_lo, disk_lo), np.minimum(u_hi, disk_hi)
+
+        # 每条射线的整数采样区间 [k_lo, k_hi]（y' 索引） / integer y' range per ray
+        k_lo = np.clip(np.ceil(u_lo + cy - eps), 0, h)
+        k_hi = np.clip(np.floor(u_hi + cy + eps), -1, h - 1)
+        lengths = np.maximum(k_hi - k_lo + 1, 0).astype(np.int64)
+        total = int(lengths.sum())
+        if fill != 0.0:
+            # 未采样的点必然越界 / unsampled points are all out of bounds
+            sinogram[:, j] = fill * (h - lengths)
+        if total == 0:
+            continue
+
+        # 展开为一维采样列表（无 Python 循环） / flatten ragged rays
+        ray = np.repeat(np.arange(n_det), lengths)
+        starts = np.cumsum(lengths) - lengths
+        k = (np.arange(total) - np.repeat(starts, lengths)
+             + np.repeat(k_lo.astype(np.int64), lengths))
+
+        x_rel = t[ray]
+        y_rel = k - cy
+        xs = cos_t * x_rel + sin_t * y_rel + cx
+        ys = -sin_t * x_rel + cos_t * y_rel + cy
+        idx, wts, outside = bilinear_taps(h, w, xs, ys)
+        vals = (flat[idx[0]] * wts[0] + flat[idx[1]] * wts[1]
+                + flat[idx[2]] * wts[2] + flat[idx[3]] * wts[3])
+        vals[outside] = fill
+        sinogram[:, j] += np.bincount(ray, weights=vals, minlength=n_det)
+
+    return sinogram
+
+
+# ===========================================================
+# 15) 稀疏像素驱动投影：只把非零像素按线性权重散射到 (s, θ)
+#     Sparse pixel-driven projection: scatter nonzeros into (s, θ) bins
+# ===========================================================
+def sparse_projections(ys: np.ndarray, xs: np.ndarray, values: np.ndarray,
+                       work_shape, angles_deg, crop: bool = True,
+                       max_elements: int = 1 << 22) -> np.ndarray:
+    """
+    像素驱动投影：每个非零像素投到 s = x_rel·cosθ − y_rel·sinθ，按线性权重分到
+    相邻两个探测器单元；所有角度一次向量化（按 max_elements 分块），用
+    np.bincount 累加。代价 O(nnz × Nθ)，与图像面积无关。
+    Pixel-driven projection: each nonzero pixel lands at
+    s = x_rel·cosθ − y_rel·sinθ and is split linearly between the two
+    neighbouring detector bins; all angles are vectorized (chunked by
+    `max_elements`) and accumulated with np.bincount. Cost is
+    O(nnz × Nθ), independent of the image area.
+
+    Parameters
+    ----------
+    ys, xs : np.ndarray (nnz,)
+        工作图坐标系中的像素行、列 / pixel rows and columns in the work frame.
+    values : np.ndarray (nnz,)
+    work_shape : (H, W)
+        工作图尺寸，探测器数 = W / work image shape; num_s = W.
+    crop : bool
+        True 则丢弃旋转后落在 (H, W) 画布外的贡献（与 "rotate" 的裁切一致；
+        使用 FOV 时不会发生，可设 False）。
+        Drop contributions that rotate off the (H, W) canvas, as "rotate"
+        does; never happens with the FOV applied, so it can be disabled.
+
+    Returns
+    -------
+    projections : np.ndarray (W, num_angles) float64
+
+    Notes
+    -----
+    这是"旋转 + 双线性"的伴随离散化：每个像素质量守恒地分到两个单元，
+    与 "rotate" 的差异在插值核层面（PL-star 细线与噪声图上相对 L2 误差均约
+    1e-2），适合 >99% 为零的掩膜 / 阈值图。
+    This is the adjoint discretization of rotate + bilinear: each pixel's
+    mass is conserved across two bins. It differs from "rotate" at the
+    interpolation-kernel level (rel-L2 about 1e-2 on both thin PL-star rays
+    and noise maps), and is meant for maps that are >99% zeros.
+    """
+    h, w = work_shape
+    cy, cx = (h - 1) / 2.0, (w - 1) / 2.0
+    theta = np.deg2rad(np.asarray(angles_deg, dtype=np.float64))
+    n_ang = len(theta)
+    out = np.zeros((w, n_ang), dtype=np.float64)
+    if len(values) == 0 or n_ang == 0:
+        return out
+
+    x_rel = np.asarray(xs, dtype=np.float64) - cx
+    y_rel = np.asarray(ys, dtype=np.float64) - cy
+    values = np.asarray(values, dtype=np.float64)
+    step = max(1, max_elements // len(values))
+
+    for start in range(0, n_ang, step):
+        stop = min(start + step, n_ang)
+        c = np.cos(theta[start:stop])[:, None]
+        s = np.sin(theta[start:stop])[:, None]
+        pos = x_rel * c - y_rel * s + cx                      # (k, nnz) 探测器下标
+        i0 = np.floor(pos)
+        frac = pos - i0
+        # 两个单元都落在画布外的贡献丢弃 / drop contributions fully off the detector
+        valid = (i0 >= -1) & (i0 <= w - 1)
+        if crop:
+            row = x_rel * s + y_rel * c + cy
+            valid &= (row >= 0) & (row <= h - 1)
+        wt = np.where(valid, values, 0.0)
+
+        # 每个角度占 w+2 个单元（两侧各留一个越界单元）/ w+2 bins per angle
+        base = (np.arange(stop - start) * (w + 2))[:, None] + 1
+        idx = (np.clip(i0, -1, w - 1).astype(np.int64) + base).ravel()
+        n_bins = (stop - start) * (w + 2)
+        acc = np.bincount(idx, weights=(wt * (1.0 - frac)).ravel(), minlength=n_bins)
+        acc += np.bincount(idx + 1, weights=(wt * frac).ravel(), minlength=n_bins)
+        out[:, start:stop] = acc.reshape(stop - start, w + 2)[:, 1:w + 1].T
+    return out
+
+
+def sparse_radon_s_theta(ys, xs, values, image_shape, angles_deg,
+                         use_circular_fov: bool = True, pad: bool = True):
+    """
+    直接从非零像素列表（原图坐标）计算正弦图，无需构造稠密图像。
+    输出排布与 radon_transform_s_theta 相同（fill 固定为 0）。
+    Sinogram straight from a list of nonzero pixels (original image
+    coordinates) without building a dense image; same layout as
+    radon_transform_s_theta, with fill fixed at 0.
+
+    Returns
+    -------
+    sinogram : np.ndarray (num_s, num_angles)
+    s_coords : np.ndarray (num_s,)
+    angles_rad : np.ndarray (num_angles,)
+    """
+    h, w = image_shape
+    ys = np.asarray(ys, dtype=np.int64)
+    xs = np.asarray(xs, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    if pad:
+        side = int(math.ceil(math.sqrt(h * h + w * w)))
+        ys, xs = ys + (side - h) // 2, xs + (side - w) // 2
+        h = w = side
+    if use_circular_fov:
+        keep = fov_mask(h, w)[ys, xs]
+        ys, xs, values = ys[keep], xs[keep], values[keep]
+
+    angles_deg = np.asarray(list(angles_deg), dtype=np.float64)
+    sinogram = sparse_projections(ys, xs, values, (h, w), angles_deg,
+                                  crop=not use_circular_fov)
+    return sinogram, detector_coords(w), np.deg2rad(angles_deg)
+
+
+# ===========================================================
+# 16) 滤波反投影（逆 Radon）
+#    Filtered back-projection (inverse Radon)
+# ===========================================================
+def fbp_filter(num_s: int, filter_name: str = "ramp") -> np.ndarray:
+    """
+    生成长度为 2 的幂（≥ 2·num_s）的频域滤波器。
+    斜坡滤波器采用空域离散设计（避免直流偏置），再乘以窗函数。
+    Frequency response (length: power of two ≥ 2·num_s) of the FBP filter.
+    The ramp is designed in the spatial domain to avoid a DC bias, then
+    multiplied by the chosen window.
+
+    Parameters
+    ----------
+    num_s : int
+        探测器数量 / number of detector bins.
+    filter_name : {"ramp", "shepp-logan", "hann"}
+
+    Returns
+    -------
+    filt : np.ndarray (size,)
+        与 np.fft.fft 频率排布一致 / in np.fft.fft frequency order.
+    """
+    size = max(64, int(2 ** math.ceil(math.log2(2 * num_s))))
+
+    # 空域斜坡核 / spatial-domain ramp kernel
+    n = np.concatenate((np.arange(1, size // 2 + 1, 2),
+                        np.arange(size // 2 - 1, 0, -2)))
+    kernel = np.zeros(size)
+    kernel[0] = 0.25
+    kernel[1::2] = -1.0 / (np.pi * n) ** 2
+    filt = 2.0 * np.real(np.fft.fft(kernel))
+
+    omega = 2.0 * np.pi * np.fft.fftfreq(size)
+    if filter_name == "ramp":
+        pass
+    elif filter_name == "shepp-logan":
+        filt[1:] *= np.sin(omega[1:] / 2.0) / (omega[1:] / 2.0)
+    elif filter_name == "hann":
+        filt *= np.fft.fftshift(np.hanning(size))
+    else:
+        raise ValueError(f"unknown filter: {filter_name!r}")
+    return filt
+
+
+# 反投影每个 (角度, 像素) 的临时内存上界（位置、索引、插值缓冲），
+# 由 tracemalloc 实测后取整留余量
+# Upper bound of back-projection temporaries per (angle, pixel): position,
+# index and interpolation buffers; measured with tracemalloc, rounded up.
+FBP_BYTES_PER_ELEMENT = 48
+
+
+def iradon_s_theta(sinogram: np.ndarray,
+                   angles_rad,
+                   filter_name: str = "ramp",
+                   output_shape=None,
+                   circle: bool = True,
+                   chunk: int = 8,
+                   max_bytes: int = 256 << 20) -> np.ndarray:
+    """
+    对 radon_transform_s_theta 输出的 (s, θ) 正弦图做滤波反投影重建。
+    Filtered back-projection of an (s, θ) sinogram from radon_transform_s_theta.
+
+    Parameters
+    ----------
+    sinogram : np.ndarray (num_s, num_angles)
+        正弦图（行=s，列=θ） / sinogram, rows = s, columns = θ.
+    angles_rad : array of float
+        各列对应的角度（弧度），应均匀覆盖 180° 或 360°。
+        Column angles in radians, uniformly covering 180° or 360°.
+    filter_name : {"ramp", "shepp-logan", "hann"}
+        频域滤波器 / frequency-domain filter.
+    output_shape : (H, W) or None
+        None 则返回 num_s × num_s 的工作网格；给定原图尺寸时按
+        pad_to_diagonal 的偏移居中裁切。
+        None returns the num_s × num_s work grid; an original (H, W) crops
+        it back with the same offsets as pad_to_diagonal.
+    circle : bool
+        True 则将内切圆之外置零（与 use_circular_fov 对应）。
+        Zero the reconstruction outside the inscribed circle.
+    chunk : int
+        每次累加的最多角度数 / at most this many angles per step.
+    max_bytes : int
+        每步临时数组的内存预算：输出按行带分块（必要时减少每步角度数），
+        临时内存约为 FBP_BYTES_PER_ELEMENT × 角度数 × 行数 × num_s，
+        与图像尺寸和总角度数无关（默认 256 MiB，4k×4k 图亦然）。行带不改变
+        结果；预算小到需减少每步角度数时，求和分组不同，末位舍入可能不同。
+        Budget for the per-step temporaries: the output is processed in
+        row bands (and fewer angles per step if needed), using about
+        FBP_BYTES_PER_ELEMENT × angles × rows × num_s bytes, independent
+        of the image size and angle count (256 MiB by default, 4k×4k maps
+        included). Row bands do not change the result; a budget so small
+        that fewer angles fit per step regroups the sums (last-bit rounding).
+
+    Returns
+    -------
+    recon : np.ndarray
+        重建图像 / reconstructed image.
+    """
+    sinogram = np.asarray(sinogram, dtype=np.float64)
+    assert sinogram.ndim == 2, "sinogram must be 2D (num_s, num_angles)"
+    angles_rad = np.asarray(angles_rad, dtype=np.float64)
+    num_s, n_ang = sinogram.shape
+    assert len(angles_rad) == n_ang, "angles_rad does not match sinogram columns"
+
+    # (1) 逐角度 1-D FFT 滤波（沿 s 轴，零填充避免循环卷积混叠）
+    #     FFT filtering along s, zero-padded against wrap-around
+    filt = fbp_filter(num_s, filter_name)
+    spec = np.fft.fft(sinogram, n=len(filt), axis=0) * filt[:, None]
+    filtered = np.real(np.fft.ifft(spec, axis=0))[:num_s]   # (num_s, num_angles)
+
+    # 两端补零，越界采样落在零上 / zero guard bins for out-of-range samples
+    guarded = np.zeros((n_ang, num_s + 2), dtype=np.float64)
+    guarded[:, 1:-1] = filtered.T
+
+    # (2) 分块（角度 × 输出行带）向量化反投影：t = x·cosθ − y·sinθ（与正变换
+    #     几何一致）；行带不改变每个像素按角度求和的顺序
+    #     Vectorized back-projection chunked over angles and output row
+    #     bands, with the forward geometry; bands keep the per-pixel
+    #     angle-sum order
+    c = (num_s - 1) / 2.0
+    coords = np.arange(num_s, dtype=np.float64) - c
+    x_rel = coords[None, None, :]
+    recon = np.zeros((num_s, num_s), dtype=np.float64)
+
+    per_line = FBP_BYTES_PER_ELEMENT * num_s
+    chunk = max(1, min(int(chunk), int(max_bytes) // per_line))
+    band = max(1, min(num_s, int(max_bytes) // (per_line * chunk)))
+
+    for start in range(0, n_ang, chunk):
+        stop = min(start + chunk, n_ang)
+        theta = angles_rad[start:stop]
+        cos_t = np.cos(theta)[:, None, None]
+        sin_t = np.sin(theta)[:, None, None]
+        rows = guarded[start:stop].ravel()
+        base = (np.arange(stop - start) * (num_s + 2))[:, None, None]
+
+        for y0 in range(0, num_s, band):
+            y1 = min(y0 + band, num_s)
+            y_rel = coords[None, y0:y1, None]
+
+            pos = x_rel * cos_t - y_rel * sin_t               # (K, rows, S)
+            pos += c
+            pos += 1.0                                        # 含保护位偏移 / guard offset
+            np.clip(pos, 0.0, num_s + 1.0, out=pos)
+            i0 = np.floor(pos).astype(np.intp)
+            np.minimum(i0, num_s, out=i0)
+            frac = np.subtract(pos, i0, out=pos)
+            i0 += base
+
+            # vals = rows[i0]·(1 − frac) + rows[i0 + 1]·frac（原地计算）
+            vals = np.take(rows, i0)
+            tmp = np.subtract(1.0, frac)
+            vals *= tmp
+            i0 += 1
+            np.take(rows, i0, out=tmp)
+            tmp *= frac
+            vals += tmp
+            recon[y0:y1] += vals.sum(axis=0)
+            del pos, i0, frac, vals, tmp
+
+    recon *= np.pi / (2.0 * n_ang)
+
+    if circle:
+        apply_circular_fov(recon, out=recon)
+
+    if output_shape is not None:
+        h, w = output_shape
+        top, left = (num_s - h) // 2, (num_s - w) // 2
+        recon = recon[top:top + h, left:left + w]
+    return recon
+
+
+# ===========================================================
+# 17) 生成一个简易 "PL-star" 测试图（含弱噪声线）
+#    Build a toy PL-star image with optional faint noise rays
+# ===========================================================
+def pl_star_ray_mask(shape, center, angles_deg, length, thickness=1) -> np.ndarray:
+    """
+    一次性计算所有射线点，并用 (2*thickness+1)² 方形结构元膨胀得到线宽，
+    返回布尔掩膜；与逐像素画刷结果完全一致。
+    Boolean mask of rays from `center`: all ray points for all angles are
+    computed at once and dilated by a (2*thickness+1)² square brush,
+    matching the per-pixel brush exactly.
+    """
+    h, w = shape
+    cy, cx = center
+    theta = np.deg2rad(np.asarray(list(angles_deg), dtype=np.float64))
+    mask = np.zeros((h, w), dtype=bool)
+    if theta.size == 0 or length <= 0:
+        return mask
+
+    r = np.arange(length, dtype=np.float64)
+    # np.rint 与内置 round 同为"四舍六入五成双" / same rounding as round()
+    x = np.rint(cx + r[None, :] * np.cos(theta)[:, None]).astype(np.int64).ravel()
+    y = np.rint(cy + r[None, :] * np.sin(theta)[:, None]).astype(np.int64).ravel()
+    keep = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+    x, y = x[keep], y[keep]
+
+    offsets = np.arange(-thickness, thickness + 1)
+    size = (len(x), len(offsets), len(offsets))
+    bx = np.broadcast_to(x[:, None, None] + offsets[None, None, :], size).ravel()
+    by = np.broadcast_to(y[:, None, None] + offsets[None, :, None], size).ravel()
+    inside = (bx >= 0) & (bx < w) & (by >= 0) & (by < h)
+    mask[by[inside], bx[inside]] = True
+    return mask
+
+
+def make_pl_star(shape=(1000, 1000),
+                 center=None,
+                 main_angles_deg=(0, 60, 120, 180, 240, 300),
+                 length=380,
+                 thickness=1,
+                 noise_angles_deg=(30, 90, 150, 210, 270, 330)) -> np.ndarray:
+    """
+    生成从中心点向若干角度发射的射线图案，可用于测试正弦图。
+    Generate a simple star-shaped pattern for testing the sinogram.
+
+    Parameters
+    ----------
+    shape : tuple
+        图像尺寸 / image shape (H, W).
+    center : (cy, cx) or None
+        射线中心；None 则取图像中心。
+        Ray origin; defaults to image center if None.
+    main_angles_deg : iterable
+        主要射线角度（值较强） / main ray angles (strong).
+    length : int
+        射线长度（像素） / ray length in pixels.
+    thickness : int
+        线条"刷子"的半径（越大线越粗）。brush radius for thickness.
+    noise_angles_deg : iterable
+        噪声射线角度（值较弱） / faint noise ray angles.
+    """
+    h, w = shape
+    img = np.zeros(shape, dtype=np.float64)
+
+    if center is None:
+        cy, cx = h // 2, w // 2
+    else:
+        cy, cx = center
+
+    # 先画主射线（强信号），再画弱噪声射线（弱信号，覆盖重叠处）
+    img[pl_star_ray_mask(shape, (cy, cx), main_angles_deg, length, thickness)] = 1.0
+    img[pl_star_ray_mask(shape, (cy, cx), noise_angles_deg, length, thickness)] = 0.25
+
+    return img
+
+
+def random_pl_star(rng=None,
+                   shape=(1000, 1000),
+                   num_rays=(3, 8),
+                   num_noise_rays=(0, 6),
+                   length_frac=(0.25, 0.5),
+                   thickness=(0, 2),
+                   intensity=(0.5, 1.0),
+                   noise_intensity=(0.1, 0.3),
+                   noise_sigma=(0.0, 0.05),
+                   haze=(0.0, 0.3),
+                   center_margin=0.2):
+    """
+    随机参数的 PL-star 样本：中心、射线角度/数量/长度/线宽、强度、
+    高斯噪声与低频背景雾均随机抽取；(lo, hi) 区间均匀采样（整数项含 hi）。
+    Random PL-star sample. Every (lo, hi) range is sampled uniformly
+    (inclusive for integer-valued ones).
+
+    Parameters
+    ----------
+    rng : np.random.Generator, int, SeedSequence or None
+    shape : tuple
+        图像尺寸 / image shape (H, W).
+    length_frac : (lo, hi)
+        射线长度占 max(H, W) 的比例 / ray length as a fraction of max(H, W).
+    haze : (lo, hi)
+        背景雾（大尺度高斯团）的幅值 / amplitude of a broad Gaussian haze.
+    center_margin : float
+        中心离边界的最小比例 / minimum distance of the center from the border.
+
+    Returns
+    -------
+    img : np.ndarray (H, W) float64
+    mask : np.ndarray (H, W) uint8
+        主射线掩膜（弱噪声射线不计入） / mask of the main rays only.
+    """
+    rng = np.random.default_rng(rng)
+    h, w = shape
+
+    def uniform(lo_hi):
+        return rng.uniform(lo_hi[0], lo_hi[1])
+
+    def integer(lo_hi):
+        return int(rng.integers(lo_hi[0], lo_hi[1] + 1))
+
+    cy = rng.uniform(center_margin, 1.0 - center_margin) * (h - 1)
+    cx = rng.uniform(center_margin, 1.0 - center_margin) * (w - 1)
+    length = int(uniform(length_frac) * max(h, w))
+    t = integer(thickness)
+
+    main = pl_star_ray_mask(shape, (cy, cx), rng.uniform(0.0, 360.0, integer(num_rays)),
+                            length, t)
+    noise = pl_star_ray_mask(shape, (cy, cx),
+                             rng.uniform(0.0, 360.0, integer(num_noise_rays)), length, t)
+
+    img = np.zeros(shape, dtype=np.float64)
+    img[noise & ~main] = uniform(noise_intensity)
+    img[main] = uniform(intensity)
+
+    amp = uniform(haze)
+    if amp > 0:
+        hy, hx = rng.uniform(0, h - 1), rng.uniform(0, w - 1)
+        sigma = rng.uniform(0.25, 1.0) * max(h, w)
+        yy, xx = np.ogrid[:h, :w]
+        img += amp * np.exp(-((yy - hy) ** 2 + (xx - hx) ** 2) / (2.0 * sigma * sigma))
+
+    sigma_n = uniform(noise_sigma)
+    if sigma_n > 0:
+        img += rng.normal(0.0, sigma_n, size=shape)
+
+    return img, main.astype(np.uint8)
+
+
+def make_pl_star_batch(n: int, shape=(1000, 1000), seed=None, workers=None,
+                       dtype=np.float32, out=None, chunk=64, **params):
+    """
+    批量生成 N 张随机 PL-star 图像及掩膜。每个样本使用 SeedSequence.spawn
+    得到的独立种子，结果与 workers 数无关；workers > 1（或 -1）时用进程池。
+    Emit N random PL-star images and masks. Each sample gets its own spawned
+    seed, so output does not depend on `workers`; workers > 1 (or -1) uses
+    a process pool.
+
+    Parameters
+    ----------
+    params :
+        透传给 random_pl_star 的参数区间 / ranges forwarded to random_pl_star.
+    out : (images, masks) or None
+        预分配输出（可为 np.memmap），形状 (N, H, W)。
+        Preallocated outputs (e.g. memmaps) of shape (N, H, W).
+    chunk : int
+        每个进程任务的样本数；同时在途的任务最多 2 × workers 个，结果写入
+        out 后即释放，父进程内存与 N 无关（配合 memmap 输出）。
+        Samples per process task. At most 2 × workers tasks are in flight
+        and each result is released once copied into `out`, so parent
+        memory does not grow with N (use memmaps for `out`).
+
+    Returns
+    -------
+    images : np.ndarray (N, H, W) dtype
+    masks : np.ndarray (N, H, W) uint8
+    """
+    if out is None:
+        images = np.empty((n,) + tuple(shape), dtype=dtype)
+        masks = np.empty((n,) + tuple(shape), dtype=np.uint8)
+    else:
+        images, masks = out
+    seeds = np.random.SeedSequence(seed).spawn(n)
+    starts = range(0, n, chunk)
+
+    if workers == -1:
+        workers = os.cpu_count() or 1
+    if workers is None or workers <= 1:
+        for start in starts:
+            imgs, msks = _pl_star_chunk(seeds[start:start + chunk], shape, dtype, params)
+            images[start:start + len(imgs)] = imgs
+            masks[start:start + len(msks)] = msks
+        return images, masks
+
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    starts = iter(starts)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        while True:
+            # 限制在途任务数 / bounded number of in-flight tasks
+            for start in starts:
+                pending[pool.submit(_pl_star_chunk, seeds[start:start + chunk], shape,
+                                    dtype, params)] = start
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                start = pending.pop(f)
+                imgs, msks = f.result()
+                images[start:start + len(imgs)] = imgs
+                masks[start:start + len(msks)] = msks
+            del done, f, imgs, msks
+    return images, masks
+
+
+def _pl_star_chunk(seeds, shape, dtype, params):
+    """子进程入口：按种子生成一块样本 / child entry generating one chunk."""
+    imgs = np.empty((len(seeds),) + tuple(shape), dtype=dtype)
+    msks = np.empty((len(seeds),) + tuple(shape), dtype=np.uint8)
+    for i, s in enumerate(seeds):
+        imgs[i], msks[i] = random_pl_star(s, shape=shape, **params)
+    return imgs, msks
+
+
+# ===========================================================
+# 18) 预计算稀疏投影矩阵（同一几何下复用）
+#    Precomputed sparse projection matrix (reused for a fixed geometry)
+# ===========================================================
+class RadonProjector:
+    """
+    对固定的 (图像尺寸, 角度集合, FOV, pad) 预先构建双线性"旋转 + 列求和"
+    的系统矩阵（SciPy CSR），之后每张图的正弦图只需一次稀疏矩阵-向量乘法。
+    Build the bilinear rotate-and-sum system matrix once (SciPy CSR) for a
+    fixed geometry; each sinogram is then a single sparse mat-vec.
+
+    矩阵形状为 (num_angles·num_s, S·S)，按角度分块（行 = j·num_s + s），
+    列对应 padded 图像的展平像素；FOV 之外的列已被置零。
+    The matrix has shape (num_angles·num_s, S·S), stacked in per-angle blocks
+    (row = j·num_s + s); columns outside the circular FOV are dropped.
+
+    Parameters
+    ----------
+    shape : (H, W)
+        原始输入图像尺寸 / shape of the raw input image.
+    angles_deg : iterable of float
+        投影角度（度） / projection angles in degrees.
+    use_circular_fov, pad, fill :
+        与 radon_transform_s_theta 相同 / same as radon_transform_s_theta.
+    cache_dir : str or None
+        不为 None 时将矩阵缓存到磁盘（按几何参数哈希命名）。
+        If given, the matrix is cached on disk under a geometry hash.
+    dtype : numpy dtype
+        矩阵数值类型；float32 可减半内存，但不再与 float64 结果逐位一致。
+        Matrix dtype; float32 halves memory at the cost of exact agreement.
+
+    Notes
+    -----
+    - 非零元数量约为 num_angles × S² × 2~3，1000×1000 图像、180 个角度时
+      矩阵可达数 GB；适合中等尺寸或重复使用同一几何的批处理。
+      nnz ≈ num_angles × S² × 2~3, i.e. several GB for 1000×1000 at 180
+      angles; best suited to moderate sizes or heavily reused geometries.
+    - fill ≠ 0 时越界采样的贡献是常数项，单独以 oob_counts 记录。
+      With fill ≠ 0, out-of-bound samples add a constant term (oob_counts).
+    """
+
+    def __init__(self, shape, angles_deg,
+                 use_circular_fov: bool = True,
+                 pad: bool = True,
+                 fill: float = 0.0,
+                 cache_dir=None,
+                 dtype=np.float64):
+        h, w = (int(v) for v in shape)
+        self.shape = (h, w)
+        self.angles_deg = np.asarray(list(angles_deg), dtype=np.float64)
+        self.angles_rad = np.deg2rad(self.angles_deg)
+        self.use_circular_fov = bool(use_circular_fov)
+        self.pad = bool(pad)
+        self.fill = float(fill)
+        self.dtype = np.dtype(dtype)
+
+        # 工作图尺寸（pad 后） / working (padded) size
+        if self.pad:
+            side = int(math.ceil(math.sqrt(h * h + w * w)))
+            self.work_shape = (side, side)
+        else:
+            self.work_shape = (h, w)
+        self.num_s = self.work_shape[1]
+        self.s_coords = detector_coords(self.num_s)
+
+        self.matrix, self.oob_counts = self._load_or_build(cache_dir)
+
+    # -------------------------------------------------------
+    # 构建 / 缓存 / build & cache
+    # -------------------------------------------------------
+    def cache_key(self) -> str:
+        """几何参数的哈希（用作缓存文件名） / geometry hash used as cache name."""
+        h = hashlib.sha1()
+        h.update(repr((self.shape, self.use_circular_fov, self.pad,
+                       self.dtype.str)).encode("utf-8"))
+        h.update(self.angles_deg.tobytes())
+        return h.hexdigest()
+
+    def _load_or_build(self, cache_dir):
+        from scipy import sparse
+
+        if cache_dir is None:
+            return self._build()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        base = os.path.join(cache_dir, "radon_projector_" + self.cache_key())
+        mat_path, oob_path = base + ".npz", base + "_oob.npy"
+        if os.path.exists(mat_path) and os.path.exists(oob_path):
+            # 损坏或截断的缓存（如写入中途被杀）直接重建 / rebuild on a corrupt or truncated cache
+            try:
+                matrix, oob = sparse.load_npz(mat_path).tocsr(), np.load(oob_path)
+                if oob.shape == (len(self.angles_deg), self.work_shape[1]):
+                    return matrix, oob
+            except (OSError, ValueError, EOFError, KeyError, zipfile.BadZipFile):
+                pass
+
+        matrix, oob = self._build()
+        # 先写临时文件再 os.replace，读者只会看到完整文件；oob 先落盘
+        # Write temp files and os.replace them so readers only see whole files
+        self._save_atomic(oob_path, lambda f: np.save(f, oob), cache_dir)
+        self._save_atomic(mat_path, lambda f: sparse.save_npz(f, matrix, compressed=False),
+                          cache_dir)
+        return matrix, oob
+
+    @staticmethod
+    def _save_atomic(path, write, cache_dir) -> None:
+        import tempfile
+
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, prefix=".radon_projector_", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp)
+            raise
+
+    def _build(self):
+        from scipy import sparse
+
+        h, w = self.work_shape
+        n_pix = h * w
+        if self.use_circular_fov:
+            keep = fov_mask(h, w).ravel()
+            # 旋转保持到中心的距离，离圆心超过 r+2 的输出像素其 4 个角点都在 FOV 外，
+            # 直接跳过 / rotation preserves the distance to the center, so output
+            # pixels beyond r+2 only hit taps outside the FOV and are skipped
+            near = fov_mask(h, w, margin=2.0).ravel()
+        else:
+            keep = np.ones(n_pix, dtype=bool)
+            near = keep
+
+        # 每个输出像素 (y', x') 贡献给探测器 s = x'
+        # Every output pixel (y', x') contributes to detector bin s = x'
+        det = np.broadcast_to(np.arange(w), (h, w)).ravel()
+
+        blocks = []
+        oob = np.zeros((len(self.angles_deg), w), dtype=np.float64)
+        for j, ang in enumerate(self.angles_deg):
+            xs, ys = inverse_rotation_coords(h, w, ang)
+            xs, ys = xs.ravel(), ys.ravel()
+            outside = (xs < 0) | (xs > (w - 1)) | (ys < 0) | (ys > (h - 1))
+            oob[j] = np.bincount(det[outside], minlength=w)
+
+            inside = ~outside & near
+            xs, ys, rows = xs[inside], ys[inside], det[inside]
+            x0 = np.floor(xs).astype(np.int64)
+            y0 = np.floor(ys).astype(np.int64)
+            dx, dy = xs - x0, ys - y0
+            x1 = np.minimum(x0 + 1, w - 1)
+            y1 = np.minimum(y0 + 1, h - 1)
+
+            cols = np.concatenate([y0 * w + x0, y0 * w + x1,
+                                   y1 * w + x0, y1 * w + x1])
+            vals = np.concatenate([(1 - dx) * (1 - dy), dx * (1 - dy),
+                                   (1 - dx) * dy, dx * dy])
+            rows = np.tile(rows, 4)
+
+            # 丢弃零权重与 FOV 外的列 / drop zero weights and columns outside FOV
+            valid = (vals != 0) & keep[cols]
+            block = sparse.coo_matrix((vals[valid], (rows[valid], cols[valid])),
+                                      shape=(w, n_pix)).tocsr()
+            blocks.append(block.astype(self.dtype))
+
+        matrix = sparse.vstack(blocks, format="csr")
+        return matrix, oob.T.copy()
+
+    # -------------------------------------------------------
+    # 投影 / projection
+    # -------------------------------------------------------
+    def _prepare(self, img: np.ndarray) -> np.ndarray:
+        work = img.astype(np.float64, copy=False)
+        if self.pad:
+            work = pad_to_diagonal(work, fill=self.fill)
+        return work
+
+    def project(self, img: np.ndarray) -> np.ndarray:
+        """
+        计算单张图像的正弦图，结果与 radon_transform_s_theta 一致。
+        Sinogram of one image, matching radon_transform_s_theta.
+
+        Returns
+        -------
+        sinogram : np.ndarray (num_s, num_angles)
+        """
+        assert img.ndim == 2, "img must be 2D"
+        assert img.shape == self.shape, "img shape does not match projector"
+        work = self._prepare(img)
+        proj = self.matrix @ work.ravel()
+        sino = proj.reshape(len(self.angles_deg), self.num_s).T
+        if self.fill != 0.0:
+            sino = sino + self.fill * self.oob_counts
+        return np.ascontiguousarray(sino, dtype=np.float64)
+
+    def project_batch(self, stack: np.ndarray, chunk: int = 16) -> np.ndarray:
+        """
+        对 (N, H, W) 图像堆栈逐块做稀疏矩阵-矩阵乘法。
+        Project an (N, H, W) stack via sparse mat-mat products in chunks.
+
+        Returns
+        -------
+        sinograms : np.ndarray (N, num_s, num_angles)
+        """
+        assert stack.ndim == 3, "stack must be 3D (N, H, W)"
+        assert stack.shape[1:] == self.shape, "stack shape does not match projector"
+        n = stack.shape[0]
+        n_ang = len(self.angles_deg)
+        out = np.empty((n, self.num_s, n_ang), dtype=np.float64)
+
+        for start in range(0, n, chunk):
+            stop = min(start + chunk, n)
+            cols = np.stack([self._prepare(stack[k]).ravel()
+                             for k in range(start, stop)], axis=1)
+            proj = self.matrix @ cols                       # (n_ang·num_s, B)
+            proj = proj.reshape(n_ang, self.num_s, stop - start)
+            out[start:stop] = proj.transpose(2, 1, 0)
+        if self.fill != 0.0:
+            out += self.fill * self.oob_counts
+        return out
+
+
+# ===========================================================
+# 19) 正弦图峰值检测（Hough 式）：提取 PL-star 射线
+#     Hough-style peak detection on sinograms for PL-star rays
+# ===========================================================
+RAY_DTYPE = np.dtype([("s", np.float64),
+                      ("theta", np.float64),
+                      ("strength", np.float64),
+                      ("s_index", np.int64),
+                      ("theta_index", np.int64)])
+
+
+def is_half_turn(angles_rad) -> bool:
+    """
+    角度是否均匀覆盖 [θ0, θ0 + 180°)，即 θ 方向满足 p(s, θ+π) = p(−s, θ) 的周期边界。
+    True if the angles uniformly cover a half turn, so the θ axis wraps
+    with p(s, θ+π) = p(−s, θ).
+    """
+    angles_rad = np.asarray(angles_rad, dtype=np.float64)
+    if len(angles_rad) < 2:
+        return False
+    step = np.diff(angles_rad)
+    return bool(np.allclose(step, step[0]) and
+                math.isclose(step[0] * len(angles_rad), math.pi, rel_tol=1e-6))
+
+
+def local_maximum_2d(sinogram: np.ndarray, neighborhood=(15, 5), periodic: bool = False) -> np.ndarray:
+    """
+    (s, θ) 网格上的可分离滑动最大值（NumPy 实现，不依赖 SciPy）。
+    periodic=True 时 θ 两端按 p(s, θ±π) = p(−s, θ) 翻转 s 后拼接。
+    Separable sliding maximum over the (s, θ) grid. With periodic=True the
+    θ edges are extended with the s-flipped opposite end.
+
+    Parameters
+    ----------
+    neighborhood : (int, int)
+        沿 s 与 θ 的窗口大小（奇数） / odd window sizes along s and θ.
+    """
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    ks, kt = (int(k) | 1 for k in neighborhood)
+    rs, rt = ks // 2, kt // 2
+    num_s, n_ang = sinogram.shape
+    rt = min(rt, n_ang)
+
+    # 先沿 s 方向 / along s first
+    padded = np.pad(sinogram, ((rs, rs), (0, 0)), mode="constant", constant_values=-np.inf)
+    mx = sliding_window_view(padded, ks, axis=0).max(axis=-1)
+
+    # 再沿 θ 方向 / then along θ
+    if periodic and rt:
+        left = mx[::-1, n_ang - rt:]
+        right = mx[::-1, :rt]
+        padded = np.concatenate([left, mx, right], axis=1)
+    else:
+        padded = np.pad(mx, ((0, 0), (rt, rt)), mode="constant", constant_values=-np.inf)
+    return sliding_window_view(padded, 2 * rt + 1, axis=1).max(axis=-1)
+
+
+def grey_opening_2d(sinogram: np.ndarray, neighborhood=(15, 5), periodic: bool = False) -> np.ndarray:
+    """
+    矩形结构元的灰度开运算（腐蚀后膨胀），复用 local_maximum_2d 的可分离滑动极值。
+    Grey opening (erosion then dilation) with a rectangular element, built
+    on the separable sliding extrema of local_maximum_2d.
+    """
+    eroded = -local_maximum_2d(-sinogram, neighborhood, periodic=periodic)
+    return local_maximum_2d(eroded, neighborhood, periodic=periodic)
+
+
+def clean_sinogram(sinogram: np.ndarray,
+                   baseline="median",
+                   window: int = 31,
+                   chord: bool = True,
+                   radius=None,
+                   min_chord: float = 0.1,
+                   tophat=(15, 3),
+                   periodic: bool = False) -> np.ndarray:
+    """
+    正弦图后处理：弦长归一化 → 逐角度基线扣除 → 2-D 顶帽，
+    全部为整阵列向量化运算，没有逐角度的 Python 循环。
+    用于压制弱噪声射线与晶圆背景雾带来的宽频低频能量，使峰值检测只看到射线响应。
+    Sinogram post-processing: chord-length normalization, per-angle
+    baseline subtraction and a 2-D top-hat, all as whole-array vectorized
+    operations (no per-angle Python loop). Suppresses the broad
+    low-frequency energy from haze and faint rays before peak detection.
+
+    Parameters
+    ----------
+    sinogram : np.ndarray (num_s, num_angles)
+    baseline : {"median", "rolling", None}
+        "median"：每列减去沿 s 的中位数；"rolling"：减去沿 s 长度为 window 的
+        滚动开运算基线（跟随缓慢变化的背景）；None 不扣除。
+        "median" subtracts each column's median over s; "rolling" subtracts a
+        sliding grey opening of length `window` along s; None skips it.
+    window : int
+        "rolling" 基线窗口（探测器数，应大于射线宽度） / rolling window in
+        detector bins, wider than a ray.
+    chord : bool
+        True 则各 s 除以 FOV 圆盘的弦长 2·sqrt(R² − s²)，使均匀背景变为常数。
+        Divide each s by the FOV chord length 2·sqrt(R² − s²), so a uniform
+        background becomes constant.
+    radius : float or None
+        FOV 半径；None 取 (num_s − 1) / 2（pad + 内切圆的默认几何）。
+        FOV radius; defaults to (num_s − 1) / 2 (the padded-disk geometry).
+    min_chord : float
+        弦长下限（占直径的比例），避免边缘短弦把噪声放大成假峰。
+        Lower bound on the chord as a fraction of the diameter, so short
+        edge chords do not blow noise up into false peaks.
+    tophat : (int, int) or None
+        2-D 顶帽结构元（沿 s, 沿 θ）；None 跳过。
+        Top-hat element (s bins, θ bins); None skips it.
+    periodic : bool
+        θ 方向是否周期（见 local_maximum_2d） / θ wrap-around, as in
+        local_maximum_2d.
+
+    Returns
+    -------
+    cleaned : np.ndarray (num_s, num_angles) float64
+    """
+    out = np.array(sinogram, dtype=np.float64)
+    num_s = out.shape[0]
+
+    if chord:
+        r = (num_s - 1) / 2.0 if radius is None else float(radius)
+        s = detector_coords(num_s)
+        length = 2.0 * np.sqrt(np.maximum(r * r - s * s, 0.0))
+        out /= np.maximum(length, max(min_chord * 2.0 * r, 1.0))[:, None]
+
+    if baseline == "median":
+        out -= np.median(out, axis=0)
+    elif baseline == "rolling":
+        out -= grey_opening_2d(out, (window, 1))
+    elif baseline is not None:
+        raise ValueError(f"unknown baseline: {baseline!r}")
+
+    if tophat is not None:
+        out -= grey_opening_2d(out, tophat, periodic=periodic)
+    return out
+
+
+def find_sinogram_peaks(sinogram: np.ndarray,
+                        s_coords: np.ndarray,
+                        angles_rad,
+                        num_peaks: int = 6,
+                        neighborhood=(15, 5),
+                        rel_threshold: float = 0.3,
+                        periodic=None) -> np.ndarray:
+    """
+    在正弦图上做非极大值抑制并取前 k 个峰，作为检测到的射线。
+    局部最大值候选再做贪心 NMS：按强度降序接受，落在已接受峰 neighborhood
+    窗口内的候选被丢弃；与峰等值的被抑制候选（平台，如轴对齐精确求和产生的
+    多个相邻等值单元）并入该峰，峰位取平台 s 索引的均值。
+    Non-maximum suppression over the sinogram and top-k selection; each peak
+    is a detected ray. Local-maximum candidates go through a greedy NMS:
+    accepted strongest first, dropped inside the `neighborhood` window of
+    an accepted peak. Equal-valued suppressed cells (plateaus, e.g. from
+    the exact axis-aligned sums) merge into that peak, which moves to the
+    plateau's mean s index.
+
+    Parameters
+    ----------
+    sinogram : np.ndarray (num_s, num_angles)
+    s_coords, angles_rad :
+        radon_transform_s_theta 的返回值 / as returned by radon_transform_s_theta.
+    num_peaks : int
+        最多返回的峰数 / maximum number of peaks.
+    neighborhood : (int, int)
+        NMS 窗口（沿 s 的探测器数, 沿 θ 的角度数） / NMS window (s bins, θ bins).
+    rel_threshold : float
+        峰值须 ≥ rel_threshold × 全局最大值 / minimum strength relative to the max.
+    periodic : bool or None
+        θ 方向是否周期（None 则由 is_half_turn 自动判断）。
+        Whether θ wraps around; auto-detected with is_half_turn if None.
+
+    Returns
+    -------
+    rays : np.ndarray, dtype RAY_DTYPE
+        字段 s（像素）、theta（弧度）、strength 及其网格索引，按强度降序。
+        Records (s, theta, strength, s_index, theta_index), strongest first.
+    """
+    sinogram = np.asarray(sinogram)
+    angles_rad = np.asarray(angles_rad, dtype=np.float64)
+    if periodic is None:
+        periodic = is_half_turn(angles_rad)
+
+    local_max = local_maximum_2d(sinogram, neighborhood, periodic=periodic)
+    peak_max = float(sinogram.max()) if sinogram.size else 0.0
+    candidates = (sinogram == local_max) & (sinogram >= rel_threshold * peak_max) & (sinogram > 0)
+
+    flat_idx = np.flatnonzero(candidates)
+    strength = sinogram.ravel()[flat_idx]
+    order = np.lexsort((flat_idx, -strength))               # 强度降序，同强度按索引
+    cand_s, cand_t = np.unravel_index(flat_idx[order], sinogram.shape)
+    strength = strength[order]
+
+    # 贪心 NMS / greedy NMS; plateau members accumulate into the peak they hit
+    half_s, half_t = neighborhood[0] // 2, neighborhood[1] // 2
+    n_t = sinogram.shape[1]
+    keep, s_sum, count = [], [], []
+    for k in range(len(strength)):
+        if keep:
+            ds = np.abs(cand_s[keep] - cand_s[k])
+            dt = np.abs(cand_t[keep] - cand_t[k])
+            if periodic:
+                dt = np.minimum(dt, n_t - dt)
+            hit = np.flatnonzero((ds <= half_s) & (dt <= half_t))
+            if len(hit):
+                p = hit[0]
+                if strength[k] == strength[keep[p]]:
+                    s_sum[p] += cand_s[k]
+                    count[p] += 1
+                continue
+        if len(keep) < num_peaks:
+            keep.append(k)
+            s_sum.append(int(cand_s[k]))
+            count.append(1)
+
+    keep = np.asarray(keep, dtype=np.intp)
+    s_mean = np.asarray(s_sum, dtype=np.float64) / np.maximum(count, 1)
+    rays = np.empty(len(keep), dtype=RAY_DTYPE)
+    rays["s"] = np.interp(s_mean, np.arange(len(s_coords)), s_coords)
+    rays["theta"] = angles_rad[cand_t[keep]]
+    rays["strength"] = strength[keep]
+    rays["s_index"] = np.rint(s_mean)
+    rays["theta_index"] = cand_t[keep]
+    return rays
+
+
+def rays_to_segments(rays: np.ndarray, image_shape, pad: bool = True) -> np.ndarray:
+    """
+    将 (s, θ) 射线映射回原图坐标系下的线段（直线与图像矩形的交）。
+    Map (s, θ) rays back to image-space segments (line ∩ image rectangle).
+
+    几何：x_rel·cosθ − y_rel·sinθ = s（相对工作图中心，y 向下），
+    方向向量 (sinθ, cosθ)。
+    Geometry: x_rel·cosθ − y_rel·sinθ = s about the work-image center (y
+    down), direction (sinθ, cosθ).
+
+    Parameters
+    ----------
+    rays : np.ndarray, dtype RAY_DTYPE
+    image_shape : (H, W)
+        原图尺寸 / original map shape.
+    pad : bool
+        正变换是否 pad 到对角线 / whether the forward transform padded.
+
+    Returns
+    -------
+    segments : np.ndarray (k, 4)
+        每行 (x0, y0, x1, y1)（像素）；与图像不相交时为 NaN。
+        Rows (x0, y0, x1, y1) in pixels; NaN if the line misses the image.
+    """
+    h, w = image_shape
+    if pad:
+        side = int(math.ceil(math.sqrt(h * h + w * w)))
+        top, left = (side - h) // 2, (side - w) // 2
+        wh = ww = side
+    else:
+        top = left = 0
+        wh, ww = h, w
+    # 工作图中心在原图坐标中的位置 / work-grid center in original coordinates
+    cx = (ww - 1) / 2.0 - left
+    cy = (wh - 1) / 2.0 - top
+
+    s = rays["s"].astype(np.float64)
+    cos_t, sin_t = np.cos(rays["theta"]), np.sin(rays["theta"])
+    px, py = cx + s * cos_t, cy - s * sin_t                  # 线上离中心最近的点 / foot point
+
+    lo1, hi1 = linear_interval(sin_t, px, 0.0, w - 1.0)
+    lo2, hi2 = linear_interval(cos_t, py, 0.0, h - 1.0)
+    u0, u1 = np.maximum(lo1, lo2), np.minimum(hi1, hi2)
+
+    segments = np.stack([px + u0 * sin_t, py + u0 * cos_t,
+                         px + u1 * sin_t, py + u1 * cos_t], axis=1)
+    segments[~(u1 >= u0)] = np.nan
+    return segments
+
+
+def detect_rays(img: np.ndarray, angles_deg, num_peaks: int = 6,
+                neighborhood=(15, 5), rel_threshold: float = 0.3, clean=None,
+                **radon_kwargs):
+    """
+    无界面自动检测：Radon → （可选去噪）→ 峰值检测 → 图像空间线段。
+    Headless detector: Radon transform → optional cleaning → peak picking →
+    image-space segments.
+
+    Parameters
+    ----------
+    clean : dict, True or None
+        传给 clean_sinogram 的参数（True 使用默认值）；None 不做后处理。
+        Keyword arguments for clean_sinogram (True for defaults); None skips it.
+
+    Returns
+    -------
+    rays : np.ndarray, dtype RAY_DTYPE
+    segments : np.ndarray (k, 4)
+    """
+    sino, s_coords, angles_rad = radon_transform_s_theta(img, angles_deg, **radon_kwargs)
+    if clean is not None:
+        sino = clean_sinogram(sino, **({} if clean is True else clean))
+    rays = find_sinogram_peaks(sino, s_coords, angles_rad, num_peaks=num_peaks,
+                               neighborhood=neighborhood, rel_threshold=rel_threshold)
+    segments = rays_to_segments(rays, img.shape, pad=radon_kwargs.get("pad", True))
+    return rays, segments
+
+
+# ===========================================================
+# 20) 多分辨率由粗到精的射线搜索
+#     Multi-resolution coarse-to-fine ray search
+# ===========================================================
+def downsample_mean(img: np.ndarray, factor: int) -> np.ndarray:
+    """
+    按 factor × factor 块求均值降采样（尾部不足一块的行列被裁掉）。
+    Block-mean downsampling by `factor` (trailing partial blocks dropped).
+    """
+    factor = int(factor)
+    if factor <= 1:
+        return img
+    h, w = img.shape
+    hh, ww = h // factor, w // factor
+    blocks = img[:hh * factor, :ww * factor].reshape(hh, factor, ww, factor)
+    return blocks.mean(axis=(1, 3))
+
+
+def detect_rays_coarse_to_fine(img: np.ndarray,
+                               num_peaks: int = 6,
+                               factor: int = 4,
+                               coarse_step_deg: float = 3.0,
+                               fine_step_deg: float = 0.5,
+                               s_band=None,
+                               neighborhood=(9, 3),
+                               rel_threshold: float = 0.3,
+                               use_circular_fov: bool = True,
+                               pad: bool = True):
+    """
+    金字塔检测：先在降采样图上以粗角度步长计算正弦图并找候选峰，
+    再只在候选附近（角度窗口 ± coarse_step_deg、s 带宽 ± s_band）用全分辨率
+    射线驱动投影细化。细化只计算少量探测器射线，代价远小于全分辨率正弦图。
+    Pyramid search: sinogram of a downsampled map at coarse angles gives
+    candidate peaks, which are refined at full resolution only inside an
+    angle window (± coarse_step_deg) and an s band (± s_band), using the
+    ray-driven projector for just those detector bins.
+
+    Parameters
+    ----------
+    num_peaks : int
+        返回的射线数 / number of rays returned.
+    factor : int
+        降采样倍数 / downsampling factor of the coarse level.
+    coarse_step_deg, fine_step_deg : float
+        粗 / 细角度步长（度） / coarse and fine angle steps in degrees.
+    s_band : float or None
+        细化时 s 的搜索半宽（像素），None 则取 2·factor + 2。
+        Half-width of the s search band in pixels; 2·factor + 2 if None.
+    neighborhood, rel_threshold :
+        粗层峰值检测参数，见 find_sinogram_peaks；rel_threshold 对细化后的
+        强度再次应用（相对细化结果的最大值），与全分辨率检测一致。
+        Coarse peak picking, see find_sinogram_peaks; rel_threshold is
+        applied again to the refined strengths (relative to their maximum),
+        matching full-resolution detection.
+
+    Returns
+    -------
+    rays : np.ndarray, dtype RAY_DTYPE
+        θ 归一化到 [0, π)，s_index 为全分辨率探测器索引，theta_index 为
+        以 fine_step_deg 为步长的角度索引。
+        θ normalized to [0, π); s_index is the full-resolution detector bin,
+        theta_index counts fine_step_deg steps.
+    segments : np.ndarray (k, 4)
+        原图坐标下的线段 / segments in original-image coordinates.
+    """
+    factor = max(int(factor), 1)
+    if s_band is None:
+        s_band = 2 * factor + 2
+
+    # (1) 粗层：降采样 + 粗角度 / coarse level
+    small = downsample_mean(img.astype(np.float64, copy=False), factor)
+    coarse_angles = np.arange(0.0, 180.0, coarse_step_deg)
+    sino_c, s_c, ang_c = radon_transform_s_theta(small, coarse_angles,
+                                                 use_circular_fov=use_circular_fov,
+                                                 pad=pad, method="ray")
+    candidates = find_sinogram_peaks(sino_c, s_c, ang_c, num_peaks=2 * num_peaks,
+                                     neighborhood=neighborhood,
+                                     rel_threshold=rel_threshold)
+
+    # (2) 细层：全分辨率，只算候选附近的射线 / fine level around candidates
+    work = prepare_work_image(img, use_circular_fov=use_circular_fov, pad=pad)
+    support = work_support_rect(img.shape, work.shape, pad)
+    s_full = detector_coords(work.shape[1])
+    offsets = np.arange(-coarse_step_deg, coarse_step_deg + 1e-9, fine_step_deg)
+
+    refined = []
+    for cand in candidates:
+        s_idx = np.flatnonzero(np.abs(s_full - cand["s"] * factor) <= s_band)
+        if len(s_idx) == 0:
+            continue
+        window = np.rad2deg(cand["theta"]) + offsets
+        local = ray_projections(work, window, use_circular_fov=use_circular_fov,
+                                support_rect=support, s_index=s_idx)
+        i, j = np.unravel_index(np.argmax(local), local.shape)
+        refined.append((s_full[s_idx[i]], window[j], local[i, j]))
+    if not refined:
+        return np.empty(0, dtype=RAY_DTYPE), np.empty((0, 4))
+
+    refined = np.array(refined)
+    # 细化后的强度同样须 ≥ rel_threshold × 最大值 / re-apply the threshold at full resolution
+    refined = refined[refined[:, 2] >= rel_threshold * refined[:, 2].max()]
+    s_val, theta_deg, strength = refined[:, 0], refined[:, 1], refined[:, 2]
+
+    # θ 归一化到 [0°, 180°)：p(s, θ+180°) = p(−s, θ)
+    # Normalize θ to [0°, 180°) using p(s, θ+180°) = p(−s, θ)
+    wrap = np.floor(theta_deg / 180.0)
+    s_val = np.where(wrap % 2 == 0, s_val, -s_val)
+    theta_deg = theta_deg - 180.0 * wrap
+
+    # 多个候选可能收敛到同一射线：按强度贪心去重
+    # Candidates may converge to the same ray: greedy de-duplication
+    order = np.argsort(strength)[::-1]
+    keep = []
+    for k in order:
+        d_theta = np.abs(theta_deg[keep] - theta_deg[k])
+        d_theta = np.minimum(d_theta, 180.0 - d_theta)
+        if not np.any((d_theta <= coarse_step_deg) & (np.abs(s_val[keep] - s_val[k]) <= s_band)):
+            keep.append(k)
+        if len(keep) == num_peaks:
+            break
+
+    keep = np.array(keep, dtype=np.int64)
+    rays = np.empty(len(keep), dtype=RAY_DTYPE)
+    rays["s"] = s_val[keep]
+    rays["theta"] = np.deg2rad(theta_deg[keep])
+    rays["strength"] = strength[keep]
+    rays["s_index"] = np.rint(s_val[keep] + (work.shape[1] - 1) / 2.0).astype(np.int64)
+    rays["theta_index"] = np.rint(theta_deg[keep] / fine_step_deg).astype(np.int64)
+    return rays, rays_to_segments(rays, img.shape, pad=pad)
+
+
+# ===========================================================
+# 21) 角度自适应采样：只在投影随角度变化剧烈处加密
+#     Angle-adaptive sampling: refine only where projections change fast
+# ===========================================================
+def adaptive_radon_s_theta(img: np.ndarray,
+                           coarse_step_deg: float = 4.0,
+                           min_step_deg: float = 0.5,
+                           threshold: float = 0.1,
+                           display_step_deg: float = 1.0,
+                           use_circular_fov: bool = True,
+                           pad: bool = True,
+                           fill: float = 0.0,
+                           method: str = "rotate",
+                           dtype=np.float64,
+                           geometry_cache=None):
+    """
+    自适应角度 Radon：先按 coarse_step_deg 均匀采样 [0°, 180°)，再反复在相邻
+    两投影的相对变化 ‖p(θ₂) − p(θ₁)‖ / max‖p‖ 超过 threshold 的区间中点加角度，
+    直到间隔达到 min_step_deg 或处处平缓。180° 处按 p(s, θ+180°) = p(−s, θ) 回绕。
+    Adaptive-angle Radon transform: start from a uniform coarse_step_deg
+    grid over [0°, 180°), then repeatedly add the midpoint of every interval
+    whose relative change ‖p(θ₂) − p(θ₁)‖ / max‖p‖ exceeds `threshold`,
+    until intervals reach min_step_deg or are flat everywhere. The 180° end
+    wraps with p(s, θ+180°) = p(−s, θ).
+
+    Parameters
+    ----------
+    display_step_deg : float
+        均匀显示视图的角度步长 / angle step of the uniform display view.
+    其余参数同 radon_transform_s_theta / the rest as in radon_transform_s_theta.
+
+    Returns
+    -------
+    sinogram : np.ndarray (num_s, num_angles)
+        非均匀角度下的投影（按角度升序） / projections at the adaptive angles.
+    s_coords : np.ndarray (num_s,)
+    angles_rad : np.ndarray (num_angles,)
+        非均匀角度（弧度，升序） / non-uniform angles in radians.
+    uniform : np.ndarray (num_s, num_display)
+        沿 θ 线性插值到均匀网格的视图，用于显示 / linearly interpolated
+        uniform view for display.
+    uniform_rad : np.ndarray (num_display,)
+        均匀视图的角度（弧度） / angles of the uniform view in radians.
+    """
+    assert img.ndim == 2, "img must be 2D"
+    work = prepare_work_image(img, use_circular_fov=use_circular_fov, pad=pad,
+                              fill=fill, dtype=dtype)
+    num_s = work.shape[1]
+
+    def project(angles):
+        block = np.zeros((num_s, len(angles)), dtype=dtype)
+        project_work(work, angles, block, img.shape, method=method,
+                     use_circular_fov=use_circular_fov, pad=pad, fill=fill,
+                     geometry_cache=geometry_cache)
+        return block
+
+    angles = np.arange(0.0, 180.0, coarse_step_deg)
+    sino = project(angles)
+    while True:
+        # 末端与 θ0+180°（s 翻转后的首列）相邻 / last column neighbours the flipped first one
+        nxt = np.concatenate([sino[:, 1:], sino[::-1, :1]], axis=1)
+        gaps = np.diff(np.append(angles, angles[0] + 180.0))
+        scale = np.linalg.norm(sino, axis=0).max() or 1.0
+        change = np.linalg.norm(nxt - sino, axis=0) / scale
+        split = (change > threshold) & (gaps >= 2.0 * min_step_deg)
+        if not split.any():
+            break
+        new = angles[split] + gaps[split] / 2.0
+        angles = np.concatenate([angles, new])
+        sino = np.concatenate([sino, project(new)], axis=1)
+        order = np.argsort(angles, kind="stable")
+        angles, sino = angles[order], sino[:, order]
+
+    # 均匀显示视图：在回绕后的角度序列上线性插值 / linear interpolation with wrap-around
+    uniform_deg = np.arange(0.0, 180.0, display_step_deg)
+    ext_angles = np.append(angles, angles[0] + 180.0)
+    ext = np.concatenate([sino, sino[::-1, :1]], axis=1)
+    pos = np.mod(uniform_deg - angles[0], 180.0) + angles[0]
+    hi = np.clip(np.searchsorted(ext_angles, pos, side="right"), 1, len(angles))
+    lo = hi - 1
+    t = (pos - ext_angles[lo]) / (ext_angles[hi] - ext_angles[lo])
+    uniform = ext[:, lo] * (1.0 - t) + ext[:, hi] * t
+
+    return (sino, detector_coords(num_s), np.deg2rad(angles),
+            uniform, np.deg2rad(uniform_deg))
+
+
+# ===========================================================
+# 22) 脚本入口：构造示例、计算 Radon、可视化
+#    Script entry: build example, compute Radon, visualize
+# ===========================================================
+if __name__ == "__main__":
+    # (1) 构造一个测试图像（中心偏移以验证非中心情况）
+    #     Build a test image; center is slightly off to show generality
+    test = make_pl_star(shape=(1000, 1000), center=(800, 470), length=380, thickness=1)
+
+    # (2) 角度范围：0..179 度（常见选择；可按需加密/稀疏）
+    #     Angles from 0 to 179 degrees (common choice)
+    angles_deg = np.arange(0, 180, 1, dtype=np.float64)
+
+    # (3) 计算 Radon（直接得到 (s, θ) 排布）
+    #     Compute Radon; output is already arranged as (s, θ)
+    sino, s, ang_rad = radon_transform_s_theta(
+        test, angles_deg, use_circular_fov=True, pad=True, fill=0.0
+    )
+
+    # (3b) 自动检测射线：峰值 → 图像空间线段
+    #      Automatic ray detection: peaks -> image-space segments
+    rays = find_sinogram_peaks(sino, s, ang_rad, num_peaks=6)
+    for ray, seg in zip(rays, rays_to_segments(rays, test.shape, pad=True)):
+        print(f"ray s={ray['s']:.1f}px θ={np.rad2deg(ray['theta']):.1f}° "
+              f"strength={ray['strength']:.1f} segment={np.round(seg, 1).tolist()}")
 
     # (4) 可选可视化（仅演示；无 matplotlib 也能运行）
     #     Optional visualization for quick verification
@@ -0,0 +1,311 @@
+# radon_batch.py
+# -----------------------------------------------------------
+# 批量 Radon：扫描 .mat 晶圆图目录，进程池计算正弦图，每个批次（lot）
+# 写入一个分块 .npy / HDF5 文件，崩溃后可从断点续算。
+# Batch Radon over a directory of .mat wafer maps: sinograms are computed
+# in a process pool and written to one chunked .npy / HDF5 file per lot;
+# an interrupted run resumes where it stopped.
+# -----------------------------------------------------------
+# 用法 / Usage:
+#   python radon_batch.py maps/ sinos/ --workers 8
+#   python radon_batch.py maps/ sinos/ --format h5 --angles 0 180 0.5
+# -----------------------------------------------------------
+# ✅ 图像字段依次尝试 modifiedMap、dw_image（可用 --field 指定）；NaN 置为 --nan-fill
+#    Maps are read from modifiedMap, then dw_image (or --field); NaNs
+#    become --nan-fill.
+# ✅ lot = 相对输入目录的子文件夹（根目录下的文件归入输入目录名），
+#    同一 lot 中不同尺寸的图分别写入 <lot>_<H>x<W>.npy / .h5
+#    A lot is the sub-folder relative to the input directory (files at the
+#    top level use the input directory's name); maps of different sizes in
+#    one lot go to separate <lot>_<H>x<W> outputs.
+# ✅ 断点续算：每个输出旁有 .json 清单，数据 flush 之后才记录完成的文件
+#    Resume: each output has a .json manifest; files are recorded as done
+#    only after their data has been flushed.
+# ✅ 单个文件读取/计算失败时记录到清单的 failed 列表并继续；续算时重试，
+#    成功后移出；有失败时退出码为 1
+#    A map that fails to load or transform is logged, recorded under
+#    "failed" in the manifest and skipped; it is retried on resume (and
+#    dropped from "failed" once it succeeds). The exit code is 1 if any
+#    map failed.
+# ✅ lot 的文件列表或设置与已有清单不一致（如新增了 .mat）时跳过该 lot 并告警，
+#    其余 lot 照常处理，退出码为 1
+#    A lot whose files or settings no longer match its manifest (e.g. a
+#    new .mat was added) is skipped with a warning; the other lots still
+#    run, and the exit code is 1.
+# ✅ 在途任务最多 2 × workers 个，结果写入后立即释放，内存与 lot 大小无关
+#    At most 2 × workers maps are in flight and each result is released
+#    once written, so memory does not grow with the lot size.
+# -----------------------------------------------------------
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+
+FIELDS = ("modifiedMap", "dw_image")
+_WORKER_CACHE = None
+
+
+def scan_maps(input_dir: str, field=None):
+    """
+    递归列出 .mat 文件，并用 whosmat 读取字段尺寸（不加载数据）。
+    Recursively list .mat files and read their field shapes with whosmat
+    (without loading the data).
+
+    Returns
+    -------
+    groups : dict
+        {(lot, (H, W)): [(relative_path, field), ...]}，组内按路径排序。
+        Files per (lot, shape), sorted by path.
+    skipped : list of (relative_path, reason)
+    """
+    from scipy.io import whosmat
+
+    fields = (field,) if field else FIELDS
+    root_lot = os.path.basename(os.path.normpath(input_dir))
+    groups, skipped = {}, []
+    for dirpath, _, filenames in os.walk(input_dir):
+        for name in sorted(filenames):
+            if not name.lower().endswith(".mat"):
+                continue
+            rel = os.path.relpath(os.path.join(dirpath, name), input_dir)
+            try:
+                shapes = {var: shape for var, shape, _ in whosmat(os.path.join(input_dir, rel))}
+            except Exception as e:
+                skipped.append((rel, f"unreadable: {e}"))
+                continue
+            found = next((f for f in fields if f in shapes), None)
+            if found is None or len(shapes[found]) != 2:
+                skipped.append((rel, f"no 2-D field among {fields}"))
+                continue
+            lot = os.path.dirname(rel).replace(os.sep, "_") or root_lot
+            groups.setdefault((lot, tuple(shapes[found])), []).append((rel, found))
+    for files in groups.values():
+        files.sort()
+    return groups, skipped
+
+
+def _init_worker(cache_bytes: int):
+    """子进程初始化：每个进程一个几何缓存，跨图像复用 / one geometry cache per process."""
+    global _WORKER_CACHE
+    from radon import GeometryCache
+
+    _WORKER_CACHE = GeometryCache(max_bytes=cache_bytes) if cache_bytes > 0 else None
+
+
+def _process_one(path, field, index, angles_deg, options):
+    """子进程入口：读取一张图并返回 (index, sinogram) / child entry for one map."""
+    from scipy.io import loadmat
+
+    from radon import radon_transform_s_theta
+
+    img = np.asarray(loadmat(path)[field], dtype=np.float64)
+    img = np.nan_to_num(img, nan=options["nan_fill"], posinf=0.0, neginf=0.0)
+    sino, _, _ = radon_transform_s_theta(img, angles_deg,
+                                         use_circular_fov=options["fov"],
+                                         pad=options["pad"],
+                                         method=options["method"],
+                                         geometry_cache=_WORKER_CACHE)
+    return index, sino.astype(options["dtype"], copy=False)
+
+
+class LotChanged(Exception):
+    """已有清单与本次输入/设置不一致 / the manifest no longer matches the inputs."""
+
+
+class LotWriter:
+    """
+    一个 (lot, 尺寸) 组的输出文件 + 续算清单。
+    Output file plus resume manifest for one (lot, shape) group.
+    """
+
+    def __init__(self, base: str, files, sino_shape, angles_deg, dtype, fmt: str,
+                 settings=None):
+        self.manifest_path = base + ".json"
+        self.fmt = fmt
+        n = len(files)
+        manifest = None
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if (manifest["files"] != [rel for rel, _ in files]
+                    or manifest["angles_deg"] != list(map(float, angles_deg))
+                    or manifest["format"] != fmt
+                    or manifest["settings"] != (settings or {})):
+                raise LotChanged(f"{self.manifest_path}: inputs or settings changed since the "
+                                 f"last run; remove it (and its data file) to rebuild this lot")
+        self.manifest = manifest or {"files": [rel for rel, _ in files],
+                                     "angles_deg": list(map(float, angles_deg)),
+                                     "format": fmt,
+                                     "settings": settings or {},
+                                     "dtype": np.dtype(dtype).str,
+                                     "done": [],
+                                     "failed": []}
+        self.manifest.setdefault("failed", [])
+        resume = manifest is not None
+        self._pending = []
+
+        shape = (n,) + tuple(sino_shape)
+        if fmt == "npy":
+            self.path = base + ".npy"
+            mode = "r+" if resume else "w+"
+            self.data = np.lib.format.open_memmap(self.path, mode=mode, dtype=dtype,
+                                                  shape=None if resume else shape)
+        else:
+            try:
+                import h5py
+            except ImportError:
+                raise SystemExit("--format h5 requires h5py (pip install h5py)")
+            self.path = base + ".h5"
+            self._h5 = h5py.File(self.path, "a" if resume else "w")
+            if "sinograms" not in self._h5:
+                self._h5.create_dataset("sinograms", shape=shape, dtype=dtype,
+                                        chunks=(1,) + tuple(sino_shape))
+                self._h5["sinograms"].attrs["angles_deg"] = np.asarray(angles_deg)
+            self.data = self._h5["sinograms"]
+        if not resume:
+            self.checkpoint()
+
+    @property
+    def done(self) -> set:
+        return set(self.manifest["done"])
+
+    def write(self, index: int, sino: np.ndarray) -> None:
+        self.data[index] = sino
+        self._pending.append(self.manifest["files"][index])
+
+    def fail(self, index: int, error: str) -> None:
+        """记录失败的文件（下次 checkpoint 写入清单）/ record a failed map."""
+        rel = self.manifest["files"][index]
+        self.manifest["failed"] = [f for f in self.manifest["failed"] if f["file"] != rel]
+        self.manifest["failed"].append({"file": rel, "error": error})
+
+    def checkpoint(self) -> None:
+        """先 flush 数据，再原子地更新清单 / flush data, then atomically update the manifest."""
+        if self.fmt == "npy":
+            self.data.flush()
+        else:
+            self._h5.flush()
+        self.manifest["done"].extend(self._pending)
+        if self._pending:
+            done = set(self._pending)
+            self.manifest["failed"] = [f for f in self.manifest["failed"]
+                                       if f["file"] not in done]
+        self._pending = []
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp, self.manifest_path)
+
+    def close(self) -> None:
+        self.checkpoint()
+        if self.fmt == "h5":
+            self._h5.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Batch Radon transform over .mat wafer maps.")
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--angles", type=float, nargs=3, default=(0.0, 180.0, 1.0),
+                        metavar=("START", "STOP", "STEP"), help="angles in degrees")
+    parser.add_argument("--field", help="variable name (default: modifiedMap, then dw_image)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--format", choices=("npy", "h5"), default="npy")
+    parser.add_argument("--dtype", choices=("float32", "float64"), default="float32")
+    parser.add_argument("--method", choices=("ray", "rotate", "shear", "fourier"), default="ray",
+                        help="'ray' matches 'rotate' exactly and is faster (default)")
+    parser.add_argument("--no-fov", action="store_true", help="do not apply the circular FOV")
+    parser.add_argument("--no-pad", action="store_true", help="do not pad to the diagonal")
+    parser.add_argument("--nan-fill", type=float, default=0.0)
+    parser.add_argument("--checkpoint", type=int, default=16,
+                        help="flush and record progress every N images")
+    parser.add_argument("--cache-mb", type=int, default=0,
+                        help="per-worker rotation geometry cache (method 'rotate' only)")
+    args = parser.parse_args(argv)
+
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    angles_deg = np.arange(*args.angles, dtype=np.float64)
+    options = {"fov": not args.no_fov, "pad": not args.no_pad, "method": args.method,
+               "nan_fill": args.nan_fill, "dtype": np.dtype(args.dtype)}
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    groups, skipped = scan_maps(args.input_dir, args.field)
+    for rel, reason in skipped:
+        print(f"skip {rel}: {reason}", file=sys.stderr)
+
+    total_done, failed, changed, t_start = 0, [], [], time.perf_counter()
+    max_pending = 2 * max(1, args.workers)
+    with ProcessPoolExecutor(max_workers=max(1, args.workers), initializer=_init_worker,
+                             initargs=(args.cache_mb << 20,)) as pool:
+        for (lot, (h, w)), files in sorted(groups.items()):
+            num_s = int(np.ceil(np.sqrt(h * h + w * w))) if options["pad"] else w
+            try:
+                writer = LotWriter(os.path.join(args.output_dir, f"{lot}_{h}x{w}"), files,
+                                   (num_s, len(angles_deg)), angles_deg, options["dtype"],
+                                   args.format,
+                                   settings={k: v for k, v in options.items() if k != "dtype"})
+            except LotChanged as e:
+                # 单个 lot 变化不中断整批 / a changed lot does not stop the run
+                print(f"skip lot {lot} {h}x{w}: {e}", file=sys.stderr, flush=True)
+                changed.append(lot)
+                continue
+            done = writer.done
+            todo = [(i, rel, field) for i, (rel, field) in enumerate(files) if rel not in done]
+            print(f"{lot} {h}x{w}: {len(files)} maps, {len(files) - len(todo)} already done")
+
+            t0, lot_failed = time.perf_counter(), len(failed)
+            queue, pending, n = iter(todo), {}, 0
+            try:
+                while True:
+                    # 限制在途任务数 / bounded number of in-flight maps
+                    for i, rel, field in queue:
+                        pending[pool.submit(_process_one, os.path.join(args.input_dir, rel),
+                                            field, i, angles_deg, options)] = (i, rel)
+                        if len(pending) >= max_pending:
+                            break
+                    if not pending:
+                        break
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for f in finished:
+                        index, rel = pending.pop(f)
+                        n += 1
+                        try:
+                            index, sino = f.result()
+                        except Exception as e:
+                            # 单个文件失败不中断整批 / one bad map does not abort the run
+                            error = f"{type(e).__name__}: {e}"
+                            print(f"  failed {rel}: {error}", file=sys.stderr, flush=True)
+                            writer.fail(index, error)
+                            failed.append(rel)
+                        else:
+                            writer.write(index, sino)
+                            del sino
+                        if n % args.checkpoint == 0 or n == len(todo):
+                            writer.checkpoint()
+                            rate = n / (time.perf_counter() - t0)
+                            print(f"  {n}/{len(todo)}  {rate:.2f} images/s", flush=True)
+                    del finished, f
+            finally:
+                writer.close()
+            total_done += len(todo) - (len(failed) - lot_failed)
+
+    elapsed = time.perf_counter() - t_start
+    print(f"done: {total_done} images in {elapsed:.1f}s "
+          f"({total_done / elapsed if elapsed > 0 else 0.0:.2f} images/s)")
+    if failed:
+        print(f"{len(failed)} map(s) failed (see 'failed' in the manifests); "
+              f"they are retried on the next run", file=sys.stderr)
+    if changed:
+        print(f"{len(changed)} lot(s) skipped because their inputs or settings changed: "
+              f"{', '.join(changed)}", file=sys.stderr)
+    return 1 if failed or changed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
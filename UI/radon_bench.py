@@ -0,0 +1,264 @@
+# radon_bench.py
+# -----------------------------------------------------------
+# Radon 基准测试：耗时 / 峰值内存 / 相对 float64 基准的精度
+# Benchmark harness for radon.py: time, peak memory and accuracy
+# -----------------------------------------------------------
+# 用法 / Usage:
+#   python radon_bench.py                         # 快速矩阵 / quick matrix
+#   python radon_bench.py --full -o bench.json    # 256..4096, 45..720
+#   python radon_bench.py --baseline bench.json   # 与基线比较，回归则退出码 1
+#                                                 # compare; exit 1 on regression
+# -----------------------------------------------------------
+# ✅ 基准值（reference）：同一 FOV/pad 选项下的 float64 "ray" 结果
+#    （与 "rotate" 仅差求和顺序带来的舍入，但快得多，大尺寸也可承受）
+#    Reference: float64 "ray" output for the same FOV/pad options
+#    (matches "rotate" up to summation order, but affordable at large sizes)
+# ✅ 耗时取 --repeat 次（默认 3）最小值；耗时回归须同时超过相对容差与
+#    绝对增量 --time-floor（默认 50 ms），且疑似变慢的用例会重测一次确认，
+#    计时抖动不会误报
+#    Time is the best of --repeat runs (default 3); a time regression must
+#    exceed both the relative tolerance and an absolute --time-floor
+#    increase (default 50 ms), and suspected slowdowns are re-timed once
+#    to confirm, so timer noise does not fail the run.
+# ✅ "rotate+gc"：几何缓存按 单角度几何字节数 × 角度数 分配并预热；超出
+#    --gc-max-mb 时跳过该用例（记录原因），不测 LRU 抖动；JSON 中记录命中率
+#    "rotate+gc" sizes its GeometryCache to one angle's geometry × the
+#    angle count and warms it first; cases that exceed --gc-max-mb are
+#    skipped (with the reason) rather than timing LRU thrashing. The hit
+#    rate is recorded in the JSON.
+# ✅ 峰值内存用 tracemalloc 统计（NumPy 的分配会被跟踪）
+#    Peak memory via tracemalloc (NumPy allocations are traced)
+# -----------------------------------------------------------
+
+import argparse
+import itertools
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from radon import GeometryCache, RotationGeometry, make_pl_star, radon_transform_s_theta
+
+
+QUICK_SIZES = (256, 512)
+QUICK_ANGLES = (45, 180)
+FULL_SIZES = (256, 512, 1024, 2048, 4096)
+FULL_ANGLES = (45, 180, 360, 720)
+METHODS = ("rotate", "rotate+gc", "shear", "ray", "fourier")
+DTYPES = ("float64", "float32")
+OPTIONS = ((True, True), (False, True), (True, False))  # (use_circular_fov, pad)
+
+
+def bench_image(size: int) -> np.ndarray:
+    """固定种子的 PL-star 测试图（含弱噪声）/ seeded PL-star test image."""
+    img = make_pl_star(shape=(size, size), center=(int(size * 0.8), int(size * 0.47)),
+                       length=int(size * 0.38), thickness=max(1, size // 1000))
+    img += np.random.default_rng(size).normal(0.0, 0.01, size=img.shape)
+    return img
+
+
+def case_key(case: dict) -> str:
+    """基线匹配用的键 / key used to match cases against the baseline."""
+    return "{size}x{num_angles}/{method}/{dtype}/fov={fov}/pad={pad}".format(**case)
+
+
+def geometry_bytes(image_shape, num_angles, dtype, pad=True) -> int:
+    """
+    "rotate+gc" 缓存全部角度几何所需的字节数（按一个非轴对齐角度估算）。
+    Bytes needed to cache every angle's geometry for "rotate+gc"
+    (estimated from one off-axis angle).
+    """
+    h, w = image_shape
+    if pad:
+        h = w = int(np.ceil(np.sqrt(h * h + w * w)))
+    buf_dtype = np.float32 if np.dtype(dtype) == np.float32 else np.float64
+    return RotationGeometry(h, w, 37.0, dtype=buf_dtype).nbytes * num_angles
+
+
+def run_case(img, angles_deg, method, dtype, fov, pad, reference, repeat=1,
+             gc_max_bytes=2 << 30):
+    """
+    计时（取 repeat 次最小值）、统计峰值内存并与 reference 比较精度。
+    Time a single case (best of `repeat`), record its peak memory and
+    compare it with `reference`. "rotate+gc" is "rotate" with a warm
+    GeometryCache sized to hold every angle; it is skipped (returns
+    {"skipped": reason}) when that exceeds `gc_max_bytes`.
+    """
+    kwargs = dict(use_circular_fov=fov, pad=pad, method=method, dtype=np.dtype(dtype))
+    cache = None
+    if method == "rotate+gc":
+        need = geometry_bytes(img.shape, len(angles_deg), dtype, pad)
+        if need > gc_max_bytes:
+            return {"skipped": f"geometry cache needs {need / 2**20:.0f}MiB "
+                               f"> {gc_max_bytes / 2**20:.0f}MiB"}
+        cache = GeometryCache(max_bytes=need)
+        kwargs.update(method="rotate", geometry_cache=cache)
+        radon_transform_s_theta(img, angles_deg, **kwargs)          # 预热 / warm up
+        cache.hits = cache.misses = 0
+
+    seconds = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        sino, _, _ = radon_transform_s_theta(img, angles_deg, **kwargs)
+        seconds = min(seconds, time.perf_counter() - t0)
+        del sino
+
+    tracemalloc.start()
+    try:
+        sino, _, _ = radon_transform_s_theta(img, angles_deg, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    diff = sino.astype(np.float64) - reference
+    ref_norm = np.linalg.norm(reference) or 1.0
+    ref_peak = np.abs(reference).max() or 1.0
+    result = {"seconds": seconds,
+              "peak_bytes": int(peak),
+              "rel_l2": float(np.linalg.norm(diff) / ref_norm),
+              "max_rel": float(np.abs(diff).max() / ref_peak)}
+    if cache is not None:
+        lookups = cache.hits + cache.misses
+        result["gc_hit_rate"] = cache.hits / lookups if lookups else 0.0
+    return result
+
+
+def run_matrix(sizes, angle_counts, methods, dtypes, options, repeat=3, log=print,
+               only=None, gc_max_bytes=2 << 30):
+    """
+    遍历参数矩阵，返回结果列表；only 给定时只运行键在其中的用例。
+    Run the whole matrix (or only the case keys in `only`); returns a list of cases.
+    """
+    results = []
+    for size, n_ang in itertools.product(sizes, angle_counts):
+        img = bench_image(size)
+        angles_deg = np.linspace(0.0, 180.0, n_ang, endpoint=False)
+        for fov, pad in options:
+            reference = None
+            for method, dtype in itertools.product(methods, dtypes):
+                case = {"size": size, "num_angles": n_ang, "method": method,
+                        "dtype": dtype, "fov": fov, "pad": pad}
+                if only is not None and case_key(case) not in only:
+                    continue
+                if reference is None:
+                    reference, _, _ = radon_transform_s_theta(img, angles_deg,
+                                                              use_circular_fov=fov,
+                                                              pad=pad, method="ray")
+                case.update(run_case(img, angles_deg, method, dtype, fov, pad,
+                                     reference, repeat=repeat, gc_max_bytes=gc_max_bytes))
+                results.append(case)
+                if "skipped" in case:
+                    log(f"{case_key(case):<48} skipped: {case['skipped']}")
+                    continue
+                log(f"{case_key(case):<48} {case['seconds']:9.3f}s "
+                    f"{case['peak_bytes'] / 2**20:9.1f}MiB  rel_l2={case['rel_l2']:.2e}")
+    return results
+
+
+def time_regressed(case, old, time_tol=0.25, time_floor=0.05) -> bool:
+    """耗时是否同时超过相对容差与绝对增量 / slower by both tolerances?"""
+    if "skipped" in case or "skipped" in old:
+        return False
+    return (case["seconds"] > old["seconds"] * (1.0 + time_tol)
+            and case["seconds"] - old["seconds"] >= time_floor)
+
+
+def compare_to_baseline(results, baseline, time_tol=0.25, mem_tol=0.25, acc_tol=1e-6,
+                        time_floor=0.05):
+    """
+    与基线逐项比较；返回回归描述列表（空列表表示通过）。
+    时间/内存允许相对增长 time_tol/mem_tol，精度允许 rel_l2 绝对增长 acc_tol；
+    耗时还须至少增加 time_floor 秒才算回归（小用例上计时噪声占主导）。
+    Compare against a baseline; returns a list of regression messages
+    (empty when everything passes). Time and memory may grow by the
+    relative tolerances, rel_l2 by the absolute `acc_tol`; time must also
+    grow by at least `time_floor` seconds (noise dominates small cases).
+    """
+    base = {case_key(c): c for c in baseline["results"]}
+    regressions = []
+    for case in results:
+        old = base.get(case_key(case))
+        if old is None or "skipped" in case or "skipped" in old:
+            continue
+        key = case_key(case)
+        if time_regressed(case, old, time_tol, time_floor):
+            regressions.append(f"{key}: time {old['seconds']:.3f}s -> {case['seconds']:.3f}s")
+        if case["peak_bytes"] > old["peak_bytes"] * (1.0 + mem_tol):
+            regressions.append(f"{key}: peak memory {old['peak_bytes'] / 2**20:.1f}MiB -> "
+                               f"{case['peak_bytes'] / 2**20:.1f}MiB")
+        if case["rel_l2"] > old["rel_l2"] + acc_tol:
+            regressions.append(f"{key}: rel_l2 {old['rel_l2']:.2e} -> {case['rel_l2']:.2e}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark radon_transform_s_theta.")
+    parser.add_argument("--full", action="store_true",
+                        help="sizes 256..4096 and 45..720 angles (slow)")
+    parser.add_argument("--sizes", type=int, nargs="+")
+    parser.add_argument("--angles", type=int, nargs="+")
+    parser.add_argument("--methods", nargs="+", default=list(METHODS), choices=METHODS)
+    parser.add_argument("--dtypes", nargs="+", default=list(DTYPES), choices=DTYPES)
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs per case")
+    parser.add_argument("-o", "--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file from a previous run to compare against")
+    parser.add_argument("--time-tol", type=float, default=0.25)
+    parser.add_argument("--mem-tol", type=float, default=0.25)
+    parser.add_argument("--acc-tol", type=float, default=1e-6)
+    parser.add_argument("--time-floor", type=float, default=0.05,
+                        help="ignore time increases smaller than this (seconds)")
+    parser.add_argument("--gc-max-mb", type=int, default=2048,
+                        help="skip 'rotate+gc' cases whose geometry cache would exceed this")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or (FULL_SIZES if args.full else QUICK_SIZES)
+    angle_counts = args.angles or (FULL_ANGLES if args.full else QUICK_ANGLES)
+    repeat = max(1, args.repeat)
+    gc_max_bytes = args.gc_max_mb << 20
+    results = run_matrix(sizes, angle_counts, args.methods, args.dtypes, OPTIONS,
+                         repeat=repeat, gc_max_bytes=gc_max_bytes)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        # 疑似变慢的用例重测一次，取两次中的较快者 / re-time suspects, keep the faster run
+        base = {case_key(c): c for c in baseline["results"]}
+        slow = {case_key(c) for c in results if case_key(c) in base
+                and time_regressed(c, base[case_key(c)], args.time_tol, args.time_floor)}
+        if slow:
+            print(f"\nre-timing {len(slow)} slower case(s) to confirm ...")
+            retimed = {case_key(c): c for c in run_matrix(sizes, angle_counts, args.methods,
+                                                          args.dtypes, OPTIONS, repeat=repeat,
+                                                          only=slow,
+                                                          gc_max_bytes=gc_max_bytes)}
+            for case in results:
+                if case_key(case) in retimed:
+                    case["seconds"] = min(case["seconds"], retimed[case_key(case)]["seconds"])
+
+    if args.output:
+        report = {"python": sys.version.split()[0],
+                  "numpy": np.__version__,
+                  "machine": platform.machine(),
+                  "processor": platform.processor(),
+                  "results": results}
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare_to_baseline(results, baseline, args.time_tol,
+                                          args.mem_tol, args.acc_tol, args.time_floor)
+        if regressions:
+            print(f"\n!!! {len(regressions)} REGRESSION(S) vs {args.baseline}:", file=sys.stderr)
+            for msg in regressions:
+                print("  " + msg, file=sys.stderr)
+            return 1
+        print(f"\nNo regressions vs {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())